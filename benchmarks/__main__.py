@@ -0,0 +1,183 @@
+"""
+Benchmark tokenization, inference and end-to-end reranking.
+
+Usage:
+    python -m benchmarks --fixture -o bench.json      # offline, tiny ONNX fixture
+    python -m benchmarks --model ms-marco-MiniLM-L-12-v2  # cached model
+
+Results are written as JSON so runs can be compared across commits.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable
+
+FILES_PATH = Path(__file__).parent.parent / 'files'
+
+def measure(fn: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """Time fn `repeat` times after one warm-up call."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"min_ms": min(timings) * 1e3, "median_ms": median(timings) * 1e3, "max_ms": max(timings) * 1e3}
+
+def sample_contexts(count: int) -> list[str]:
+    """Mixed-length contexts built from bundled sample files."""
+    lines = [line for line in (FILES_PATH / 'contexts').read_text(encoding="utf-8").split('\n') if line]
+    long = ' '.join(lines)
+    base = lines + [long, long * 4]
+    return [base[idx % len(base)] for idx in range(count)]
+
+def bench_tokenizer(model_id: str, repeat: int) -> dict:
+    from swiftrank import Tokenizer
+    tokenizer = Tokenizer(model_id=model_id)
+    pairs = [("Jujutsu Kaisen: Season 2", context) for context in sample_contexts(256)]
+    encode = measure(lambda: tokenizer.instance.encode_batch(pairs), repeat)
+    return {
+        "load": measure(lambda: Tokenizer(model_id=model_id), repeat),
+        "encode_batch": encode | {"pairs": len(pairs), "pairs_per_sec": len(pairs) / (encode["median_ms"] / 1e3)},
+    }
+
+def bench_ranker(model_id: str, repeat: int, batch_sizes: list[int], seq_lengths: list[int]) -> list[dict]:
+    import numpy as np
+    from swiftrank import Ranker
+    session = Ranker(model_id=model_id).instance
+    input_names = {node.name for node in session.get_inputs()}
+    rng = np.random.default_rng(0)
+    results = []
+    for batch_size in batch_sizes:
+        for seq_length in seq_lengths:
+            onnx_input = {
+                "input_ids": rng.integers(5, 100, size=(batch_size, seq_length), dtype=np.int64),
+                "attention_mask": np.ones((batch_size, seq_length), dtype=np.int64),
+                "token_type_ids": np.zeros((batch_size, seq_length), dtype=np.int64),
+            }
+            onnx_input = {name: value for name, value in onnx_input.items() if name in input_names}
+            results.append({"batch_size": batch_size, "seq_length": seq_length} | measure(
+                lambda: session.run(None, onnx_input), repeat))
+    return results
+
+def bench_pipeline(model_id: str, repeat: int) -> list[dict]:
+    from swiftrank import ReRankPipeline
+    contexts = sample_contexts(500)
+    results = []
+    for batch_size in (None, 32):
+        pipeline = ReRankPipeline.from_model_id(model_id, batch_size=batch_size)
+        results.append({"contexts": len(contexts), "batch_size": batch_size} | measure(
+            lambda: pipeline.invoke("Jujutsu Kaisen: Season 2", contexts), repeat))
+    return results
+
+def bench_object_parser(repeat: int) -> dict:
+    from swiftrank.interface.utils import object_parser
+    data = json.loads((FILES_PATH / 'contexts.json').read_text(encoding="utf-8"))
+    items = data['categories'][0]['items'] * 1000
+
+    def parse():
+        object_parser(data, '.categories[].items')
+        for item in items:
+            object_parser(item, '.name')
+    return {"objects": len(items)} | measure(parse, repeat)
+
+def bench_cli_input(repeat: int) -> list[dict]:
+    import yaml
+    from swiftrank.interface.utils import load_input
+    items = json.loads((FILES_PATH / 'contexts.json').read_text(encoding="utf-8"))['categories'][0]['items']
+    many = json.loads(json.dumps(items * 2000))
+    payloads = {
+        "json": json.dumps({"categories": [{"items": many}]}),
+        "jsonl": '\n'.join(map(json.dumps, many)),
+        "yaml": yaml.safe_dump({"categories": [{"items": many[:4000]}]}),
+        "yamllines": '---\n'.join(map(yaml.safe_dump, many[:4000])),
+    }
+    results = []
+    for name, text in payloads.items():
+        fmt = 'yaml' if name == 'yamllines' else name
+        results.append({"input": name, "mib": len(text) / 2**20} | {
+            "sniffed": measure(lambda: load_input(text), repeat),
+            "explicit": measure(lambda: load_input(text, fmt), repeat),
+        })
+    return results
+
+def bench_api(model_id: str, requests: int) -> dict:
+    try:
+        from fastapi.testclient import TestClient
+    except (ImportError, RuntimeError) as e:
+        return {"skipped": f"TestClient unavailable: {e}"}
+    from swiftrank.interface.api import server
+
+    client = TestClient(server)
+    body = {"model": model_id, "query": "Jujutsu Kaisen: Season 2", "contexts": sample_contexts(50)}
+    client.post('/rerank', json=body).raise_for_status()
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.post('/rerank', json=body).raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {"requests": requests, "contexts": len(body["contexts"]), "requests_per_sec": requests / elapsed}
+
+def environment() -> dict:
+    import numpy, onnxruntime, tokenizers
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=FILES_PATH.parent
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "onnxruntime": onnxruntime.__version__,
+        "tokenizers": tokenizers.__version__,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument("--model", default=None, help="cached model id to benchmark.")
+    parser.add_argument("--fixture", action="store_true", help="benchmark a tiny offline ONNX fixture.")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement.")
+    parser.add_argument("--requests", type=int, default=50, help="requests sent to /rerank.")
+    parser.add_argument("-o", "--output", default=None, help="write JSON results to file instead of stdout.")
+    args = parser.parse_args()
+
+    if args.fixture:
+        from .fixture import build_fixture, MODEL_ID
+        cache_dir = tempfile.mkdtemp(prefix="swiftrank-bench-")
+        build_fixture(Path(cache_dir))
+        os.environ["SWIFTRANK_CACHE"] = cache_dir
+        model_id = MODEL_ID
+    else:
+        from swiftrank import settings
+        model_id = args.model or settings.DEFAULT_MODEL
+
+    results = {
+        "environment": environment(),
+        "model": model_id,
+        "fixture": args.fixture,
+        "tokenizer": bench_tokenizer(model_id, args.repeat),
+        "ranker_run": bench_ranker(model_id, args.repeat, batch_sizes=[1, 8, 32, 128], seq_lengths=[32, 128, 256]),
+        "pipeline_invoke": bench_pipeline(model_id, args.repeat),
+        "object_parser": bench_object_parser(args.repeat),
+        "cli_input": bench_cli_input(args.repeat),
+        "api_rerank": bench_api(model_id, args.requests),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        Path(args.output).write_text(output)
+
+if __name__ == "__main__":
+    sys.exit(main())
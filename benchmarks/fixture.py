@@ -0,0 +1,76 @@
+"""Tiny offline model fixture laid out like a cached swiftrank model directory."""
+import re
+import json
+from pathlib import Path
+
+import numpy as np
+
+FILES_PATH = Path(__file__).parent.parent / 'files'
+MODEL_ID = "ms-marco-TinyBERT-L-2-v2"
+MODEL_FILE = "flashrank-TinyBERT-L-2-v2.onnx"
+
+def build_fixture(cache_dir: Path, hidden_size: int = 32, seed: int = 0) -> Path:
+    """
+    Build a tokenizer and a mean-pooling ONNX scorer under `cache_dir/<MODEL_ID>`.
+    Requires the `onnx` package.
+    """
+    try:
+        import onnx
+        from onnx import helper, numpy_helper, TensorProto
+    except ImportError:
+        raise ImportError("Building the model fixture requires onnx. Run `pip install onnx`.")
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+
+    model_dir = Path(cache_dir) / MODEL_ID
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    words = set()
+    for path in FILES_PATH.iterdir():
+        words.update(re.findall(r"\w+|[^\w\s]", path.read_text(encoding="utf-8").lower()))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *sorted(words)]
+    (model_dir / "vocab.txt").write_text("\n".join(vocab) + "\n", encoding="utf-8")
+
+    tokenizer = Tokenizer(models.WordPiece({tok: idx for idx, tok in enumerate(vocab)}, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B:1 [SEP]:1", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    tokenizer.save(str(model_dir / "tokenizer.json"))
+    (model_dir / "config.json").write_text(json.dumps({"pad_token_id": 0}))
+    (model_dir / "tokenizer_config.json").write_text(json.dumps({"model_max_length": 512, "pad_token": "[PAD]"}))
+    (model_dir / "special_tokens_map.json").write_text(json.dumps({
+        "cls_token": "[CLS]", "sep_token": "[SEP]", "pad_token": "[PAD]", "unk_token": "[UNK]", "mask_token": "[MASK]"
+    }))
+
+    rng = np.random.default_rng(seed)
+    initializers = [
+        numpy_helper.from_array(rng.normal(size=(len(vocab), hidden_size)).astype(np.float32), "word_embeddings"),
+        numpy_helper.from_array(rng.normal(size=(2, hidden_size)).astype(np.float32), "type_embeddings"),
+        numpy_helper.from_array(rng.normal(size=(hidden_size, 1)).astype(np.float32), "classifier"),
+        numpy_helper.from_array(np.array([2], dtype=np.int64), "hidden_axis"),
+        numpy_helper.from_array(np.array([1], dtype=np.int64), "sequence_axis"),
+    ]
+    nodes = [
+        helper.make_node("Gather", ["word_embeddings", "input_ids"], ["words"]),
+        helper.make_node("Gather", ["type_embeddings", "token_type_ids"], ["types"]),
+        helper.make_node("Add", ["words", "types"], ["embeddings"]),
+        helper.make_node("Cast", ["attention_mask"], ["mask"], to=TensorProto.FLOAT),
+        helper.make_node("Unsqueeze", ["mask", "hidden_axis"], ["mask3d"]),
+        helper.make_node("Mul", ["embeddings", "mask3d"], ["masked"]),
+        helper.make_node("ReduceSum", ["masked", "sequence_axis"], ["summed"], keepdims=0),
+        helper.make_node("ReduceSum", ["mask", "sequence_axis"], ["counts"], keepdims=1),
+        helper.make_node("Div", ["summed", "counts"], ["pooled"]),
+        helper.make_node("MatMul", ["pooled", "classifier"], ["logits"]),
+    ]
+    inputs = [
+        helper.make_tensor_value_info(name, TensorProto.INT64, ["batch", "sequence"])
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+    ]
+    graph = helper.make_graph(
+        nodes, "fixture", inputs, [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 1])], initializers
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(model_dir / MODEL_FILE))
+    return model_dir
@@ -1,2 +1,34 @@
-from . import settings
-from .ranker import Ranker, Tokenizer, ReRankPipeline
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import settings
+    from .cache import ScoreCache
+    from .index import CorpusIndex
+    from .cascade import CascadePipeline
+    from .ranker import Ranker, Tokenizer, ReRankPipeline, create_session_options
+
+# Resolved on first access (PEP 562), so `import swiftrank` doesn't load numpy, onnxruntime and tokenizers.
+_LAZY_ATTRIBUTES = {
+    "settings": ".settings",
+    "ScoreCache": ".cache",
+    "CorpusIndex": ".index",
+    "CascadePipeline": ".cascade",
+    "Ranker": ".ranker",
+    "Tokenizer": ".ranker",
+    "ReRankPipeline": ".ranker",
+    "create_session_options": ".ranker",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    module = import_module(_LAZY_ATTRIBUTES[name], __name__)
+    value = module if name == "settings" else getattr(module, name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
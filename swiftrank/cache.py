@@ -0,0 +1,122 @@
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Iterable, Sequence
+
+from . import settings
+
+
+class ScoreCache:
+    """
+    LRU cache of relevance logits keyed by model, tokenizer max length, query and context.
+
+    Example:
+    ```python
+    from swiftrank import ReRankPipeline, ScoreCache
+    cache = ScoreCache(maxsize=100_000, persist=True)
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", cache=cache)
+    pipeline.invoke(query="<query>", contexts=["<context1>", "<context2>", ...])
+    print(cache.stats())
+    ```
+    """
+    def __init__(
+        self, maxsize: int = 65536, persist: bool = False, path: Optional[Path] = None
+    ) -> None:
+        """
+        Initialize a score cache
+        @param maxsize: Max number of entries held in memory.
+        @param persist: Keep an on-disk tier under cache directory.
+        @param path: Path of on-disk tier database. Implies persist.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer.")
+        self.maxsize = maxsize
+        self.hits = self.disk_hits = self.misses = 0
+        self.__memory: OrderedDict[bytes, float] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__db = None
+        if persist or path is not None:
+            self.path = Path(path or settings.DEFAULT_CACHE_DIR / "scores.sqlite3")
+            self.__db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, logit REAL NOT NULL)")
+            self.__db.commit()
+
+    @staticmethod
+    def make_key(model_id: str, max_length: int, query: str, context: str) -> bytes:
+        """Create cache key from model id, tokenizer max length, query and context."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (model_id, str(max_length), query, context):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> list[Optional[float]]:
+        """Get cached logits of keys. Missing entries are `None`."""
+        with self.__lock:
+            values = [self.__memory.get(key) for key in keys]
+            for key, value in zip(keys, values):
+                if value is not None:
+                    self.__memory.move_to_end(key)
+
+            if self.__db is not None:
+                missing = {key: idx for idx, key in enumerate(keys) if values[idx] is None}
+                for key, logit in self.__fetch(list(missing)):
+                    values[missing[key]] = logit
+                    self.__insert(key, logit)
+                    self.disk_hits += 1
+
+            found = sum(value is not None for value in values)
+            self.hits += found
+            self.misses += len(values) - found
+        return values
+
+    def put_many(self, items: Iterable[tuple[bytes, float]]) -> None:
+        """Store logits of keys."""
+        items = [(key, float(logit)) for key, logit in items]
+        with self.__lock:
+            for key, logit in items:
+                self.__insert(key, logit)
+            if self.__db is not None:
+                self.__db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?)", items)
+                self.__db.commit()
+
+    def stats(self) -> dict[str, int | float]:
+        """Get hit/miss counters and current size."""
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.__memory),
+                "maxsize": self.maxsize
+            }
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self.__lock:
+            self.__memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self.__db is not None:
+                self.__db.execute("DELETE FROM scores")
+                self.__db.commit()
+
+    def __insert(self, key: bytes, logit: float) -> None:
+        """Insert entry into memory tier, evicting least recently used entries."""
+        self.__memory[key] = logit
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.maxsize:
+            self.__memory.popitem(last=False)
+
+    def __fetch(self, keys: list[bytes], chunk_size: int = 500):
+        """Fetch entries from disk tier."""
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            yield from self.__db.execute(
+                f"SELECT key, logit FROM scores WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
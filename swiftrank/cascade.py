@@ -0,0 +1,185 @@
+from typing import Iterable, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from . import settings
+from .index import CorpusIndex
+from .ranker import BaseReRankPipeline, ReRankPipeline, StageHook
+
+_T = TypeVar("_T")
+
+SPEC_SEPARATOR = ">"
+"""Separates cheap and expensive model of a cascade spec, e.g. `ms-marco-TinyBERT-L-2-v2>ms-marco-MiniLM-L-12-v2`"""
+
+
+def parse_spec(spec: str) -> list[str]:
+    """
+    Split a model spec into model ids: one for a single model, cheap and expensive ones for a cascade.
+    Ids are kept as written, like single model ids they must match exactly.
+    @param spec: Model ID or `<cheap>><expensive>` cascade spec.
+    """
+    model_ids = spec.split(SPEC_SEPARATOR)
+    if len(model_ids) > 2:
+        raise ValueError(f"{spec!r} cascade spec must have two models.")
+    return model_ids
+
+
+class CascadePipeline(BaseReRankPipeline):
+    """
+    Early-exit cascade of two pipelines. Every context is scored by the cheap pipeline and
+    only survivors of each query, its `keep` best within `margin` of the best, are rescored
+    by the expensive one. Pruned contexts are left out of the ranking, survivors are ranked
+    by expensive scores.
+
+    Example:
+    ```python
+    from swiftrank import CascadePipeline
+    pipeline = CascadePipeline.from_spec("ms-marco-TinyBERT-L-2-v2>ms-marco-MiniLM-L-12-v2", keep=20)
+    pipeline.invoke(
+        query="<query>", contexts=["<context1>", "<context2>", ...]
+    )
+    ```
+    """
+    def __init__(
+        self,
+        cheap: ReRankPipeline,
+        expensive: ReRankPipeline,
+        keep: Optional[int] = None,
+        margin: Optional[float] = None
+    ) -> None:
+        """
+        Initialize a cascade pipeline
+        @param cheap: Pipeline scoring every context.
+        @param expensive: Pipeline rescoring survivors and ranking them.
+        @param keep: Max number of contexts per query rescored. Defaults to `settings.CASCADE_KEEP` without margin.
+        @param margin: Only rescore contexts whose cheap score is within margin of the best one of their query.
+        """
+        if keep is not None and keep < 1:
+            raise ValueError("keep must be a positive integer.")
+        if margin is not None and margin < 0:
+            raise ValueError("margin must not be negative.")
+        self.cheap, self.expensive = cheap, expensive
+        self.keep = settings.CASCADE_KEEP if keep is None and margin is None else keep
+        self.margin = margin
+        self.model_id = f"{cheap.model_id}{SPEC_SEPARATOR}{expensive.model_id}"
+
+    @classmethod
+    def from_spec(cls, spec: str, keep: Optional[int] = None, margin: Optional[float] = None, **kwargs):
+        """
+        Create cascade from a `<cheap>><expensive>` spec
+        @param spec: Cascade spec.
+        @param keep: Max number of contexts per query rescored.
+        @param margin: Only rescore contexts within margin of the best cheap score.
+        @param kwargs: `ReRankPipeline.from_model_id` options of both pipelines.
+        """
+        model_ids = parse_spec(spec)
+        if len(model_ids) != 2:
+            raise ValueError(f"{spec!r} is not a cascade spec.")
+        cheap, expensive = (ReRankPipeline.from_model_id(model_id, **kwargs) for model_id in model_ids)
+        return cls(cheap, expensive, keep=keep, margin=margin)
+
+    def add_hook(self, hook: StageHook) -> None:
+        """
+        Register a stage timing callback on both pipelines.
+        @param hook: Callback receiving (stage, seconds, sizes).
+        """
+        for pipeline in (self.cheap, self.expensive):
+            pipeline.add_hook(hook)
+
+    def warm_up(self, shapes: Optional[Iterable[tuple[int, int]]] = None) -> None:
+        """
+        Warm up both pipelines.
+        @param shapes: (batch size, sequence length) pairs to run.
+        """
+        shapes = None if shapes is None else list(shapes)
+        for pipeline in (self.cheap, self.expensive):
+            pipeline.warm_up(shapes)
+
+    def survivors(self, scores: np.ndarray, sizes: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Positions of contexts passed on to the expensive pipeline, in input order.
+        @param scores: Cheap scores of contexts of all queries concatenated in order.
+        @param sizes: Number of contexts of each query. Defaults to contexts of a single query.
+        """
+        offsets = np.cumsum(sizes)[:-1] if sizes else []
+        selected = []
+        for start, group_scores in zip(np.concatenate(([0], offsets)).astype(np.intp), np.split(scores, offsets)):
+            indices = np.arange(len(group_scores))
+            if self.margin is not None and len(indices):
+                indices = indices[group_scores >= group_scores.max() - self.margin]
+            if self.keep is not None and self.keep < len(indices):
+                indices = indices[np.argpartition(-group_scores[indices], self.keep - 1)[:self.keep]]
+            selected.append(np.sort(indices) + start)
+        return np.concatenate(selected) if selected else np.empty(0, dtype=np.intp)
+
+    def score_pairs(
+        self, pairs: Sequence[tuple[str, str]], raw: bool = False, sizes: Optional[Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        Compute relevance scores of (query, context) pairs in input order.
+        Pruned pairs are scored `nan`.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits of the expensive model, before calibration and activation.
+        @param sizes: Number of consecutive pairs of each query, survivors are picked per query.
+            Defaults to pairs of a single query.
+        """
+        scores = np.full(len(pairs), np.nan, dtype=np.float32)
+        indices = self.survivors(self.cheap.score_pairs(pairs), sizes)
+        scores[indices] = self.expensive.score_pairs([pairs[idx] for idx in indices], raw=raw)
+        return scores
+
+    async def ascore_pairs(
+        self, pairs: Sequence[tuple[str, str]], raw: bool = False, sizes: Optional[Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        Awaitable `score_pairs`, each pipeline scoring off the event loop.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits of the expensive model, before calibration and activation.
+        @param sizes: Number of consecutive pairs of each query. Defaults to pairs of a single query.
+        """
+        scores = np.full(len(pairs), np.nan, dtype=np.float32)
+        indices = self.survivors(await self.cheap.ascore_pairs(pairs), sizes)
+        scores[indices] = await self.expensive.ascore_pairs([pairs[idx] for idx in indices], raw=raw)
+        return scores
+
+    def _score_queries(self, pairs: Sequence[tuple[str, str]], sizes: Sequence[int]) -> np.ndarray:
+        """Score pairs of several queries, picking survivors of each query separately."""
+        return self.score_pairs(pairs, sizes=sizes)
+
+    def activate(self, logits: np.ndarray) -> np.ndarray:
+        """
+        Turn relevance logits of the expensive model into scores.
+        @param logits: Relevance logits, as returned by `score_pairs(..., raw=True)`.
+        """
+        return self.expensive.activate(logits)
+
+    def score_index(
+        self, query: str, index: CorpusIndex, doc_ids: Optional[Iterable[int]] = None, raw: bool = False
+    ) -> np.ndarray:
+        """
+        Compute relevance scores of indexed documents for query. Pruned documents are scored `nan`.
+        Both pipelines must share the tokenizer the index was built with.
+        @param query: The query to use for reranking evaluation.
+        @param index: `CorpusIndex` built with the tokenizer of both pipelines.
+        @param doc_ids: Ids of documents to score, in order. Defaults to every document.
+        @param raw: Return relevance logits of the expensive model, before calibration and activation.
+        """
+        ids = np.arange(len(index)) if doc_ids is None else np.asarray(
+            doc_ids if isinstance(doc_ids, (list, np.ndarray)) else list(doc_ids), dtype=np.int64)
+        scores = np.full(len(ids), np.nan, dtype=np.float32)
+        indices = self.survivors(self.cheap.score_index(query, index, ids))
+        scores[indices] = self.expensive.score_index(query, index, ids[indices], raw=raw)
+        return scores
+
+    def rank(
+        self, contexts: Sequence[_T], scores: np.ndarray, threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[tuple[float, _T]]:
+        """
+        Order surviving contexts by relevance scores with the expensive pipeline, leaving out pruned (`nan`) ones.
+        @param contexts: The contexts object.
+        @param scores: Relevance scores of contexts.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        """
+        indices = np.flatnonzero(~np.isnan(scores))
+        return self.expensive.rank([contexts[idx] for idx in indices], scores[indices], threshold=threshold, top_k=top_k)
@@ -0,0 +1,180 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from urllib.parse import urljoin
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import requests
+from tqdm import tqdm
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+"""Bytes read from a response at once"""
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on path across processes and threads. The lock file is kept.
+    @param path: Lock file path.
+    """
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class _Remote:
+    """Size, range support and checksum of a remote file."""
+    def __init__(self, url: str) -> None:
+        self.url, self.size, self.ranges, self.sha256, self.etag = url, None, False, None, None
+        try:
+            response = requests.head(url, allow_redirects=False, timeout=30)
+            # Hugging Face answers LFS files with a redirect carrying the sha256 as linked etag.
+            self.sha256 = self.__parse_sha256(response.headers.get("x-linked-etag"))
+            self.etag = response.headers.get("x-linked-etag") or response.headers.get("etag")
+            if response.is_redirect:
+                self.url = urljoin(url, response.headers["location"])
+                response = requests.head(self.url, allow_redirects=True, timeout=30)
+                self.etag = self.etag or response.headers.get("etag")
+        except requests.RequestException:
+            return
+        if response.ok:
+            length = response.headers.get("content-length")
+            self.size = int(length) if length else None
+            self.ranges = response.headers.get("accept-ranges", "").lower() == "bytes"
+
+    @staticmethod
+    def __parse_sha256(etag: Optional[str]) -> Optional[str]:
+        value = (etag or "").removeprefix("W/").strip('"').lower()
+        if len(value) == 64 and all(char in "0123456789abcdef" for char in value):
+            return value
+        return None
+
+
+def download(
+    url: str, path: Path, connections: int = 4, chunk_size: int = 8 * 1024 * 1024, desc: Optional[str] = None
+) -> None:
+    """
+    Download url into path. Data is written into `<path>.part` and renamed once complete and verified,
+    so path either does not exist or holds the whole file. When the server supports range requests,
+    the file is fetched in chunks over parallel connections and an interrupted download resumes
+    from its finished chunks. Size and, when advertised, sha256 are verified.
+    @param url: File URL.
+    @param path: Destination path.
+    @param connections: Max parallel range requests.
+    @param chunk_size: Bytes per range request.
+    @param desc: Progress bar description.
+    """
+    remote = _Remote(url)
+    part_path = path.with_name(f"{path.name}.part")
+    progress = tqdm(desc=desc or path.name, total=remote.size, unit='iB', unit_scale=True, unit_divisor=1024)
+    try:
+        if remote.size and remote.ranges:
+            _download_chunks(remote, part_path, connections, chunk_size, progress)
+        else:
+            _download_stream(remote, part_path, progress)
+    finally:
+        progress.close()
+
+    size = part_path.stat().st_size
+    if remote.size is not None and size != remote.size:
+        part_path.unlink()
+        raise OSError(f"Downloaded {size} bytes of {url!r}, expected {remote.size}.")
+    if remote.sha256 is not None and _sha256(part_path) != remote.sha256:
+        part_path.unlink()
+        raise OSError(f"Checksum mismatch for {url!r}.")
+    os.replace(part_path, path)
+
+
+def _download_stream(remote: _Remote, part_path: Path, progress: tqdm) -> None:
+    """Download whole file over one connection."""
+    with requests.get(remote.url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                progress.update(handle.write(chunk))
+
+
+def _download_chunks(
+    remote: _Remote, part_path: Path, connections: int, chunk_size: int, progress: tqdm
+) -> None:
+    """Download missing chunks with range requests, recording finished chunks next to the part file."""
+    state_path = part_path.with_name(f"{part_path.name}.json")
+    identity = {"size": remote.size, "chunk_size": chunk_size, "etag": remote.etag}
+    done: set[int] = set()
+    if part_path.exists() and state_path.exists():
+        try:
+            state = json.loads(state_path.read_text())
+            if state["identity"] == identity and part_path.stat().st_size == remote.size:
+                done = set(state["done"])
+        except (ValueError, KeyError):
+            pass
+    if not done:
+        with open(part_path, "wb") as handle:
+            handle.truncate(remote.size)
+
+    chunks = -(-remote.size // chunk_size)
+    progress.update(sum(min(chunk_size, remote.size - idx * chunk_size) for idx in done))
+    lock = threading.Lock()
+
+    def fetch(idx: int) -> None:
+        start = idx * chunk_size
+        end = min(start + chunk_size, remote.size) - 1
+        headers = {"Range": f"bytes={start}-{end}"}
+        with requests.get(remote.url, headers=headers, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise OSError(f"Range request ignored by {remote.url!r}.")
+            written = 0
+            with open(part_path, "r+b") as handle:
+                handle.seek(start)
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    written += handle.write(chunk)
+                    progress.update(len(chunk))
+        if written != end - start + 1:
+            raise OSError(f"Incomplete range {start}-{end} of {remote.url!r}.")
+        with lock:
+            done.add(idx)
+            temp_path = state_path.with_name(f"{state_path.name}.tmp")
+            temp_path.write_text(json.dumps({"identity": identity, "done": sorted(done)}))
+            os.replace(temp_path, state_path)
+
+    missing = [idx for idx in range(chunks) if idx not in done]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(connections, len(missing))), thread_name_prefix="swiftrank-download")
+    try:
+        for _ in executor.map(fetch, missing):
+            pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+    state_path.unlink(missing_ok=True)
+
+
+def _sha256(path: Path) -> str:
+    """Compute sha256 hex digest of file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while chunk := handle.read(STREAM_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,155 @@
+"""
+Memory-mapped corpus index.
+
+A fixed document set is tokenized once into a single file:
+- 64 byte header: magic, offset and length of the JSON metadata.
+- Token ids of every document concatenated, without special tokens or truncation.
+  Stored as uint16 when the vocab fits, int32 otherwise.
+- int64 offsets of each document's token ids, 8 byte aligned.
+- JSON metadata: model, tokenizer fingerprint, counts, dtype and array offsets.
+
+Pipelines rerank documents by id straight from the mapped arrays, so repeated queries over
+the corpus only tokenize the query.
+"""
+import os
+import json
+import struct
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, cast
+
+import numpy as np
+from tokenizers import Tokenizer as TokenizerLoader
+
+if TYPE_CHECKING:
+    from .ranker import Tokenizer
+
+MAGIC = b"SRINDEX\x01"
+HEADER = struct.Struct("<8sQQ")
+"""Magic, metadata offset and metadata length"""
+HEADER_SIZE = 64
+"""Bytes reserved for the header, token ids start right after"""
+
+
+def part_encoder(tokenizer: TokenizerLoader) -> TokenizerLoader:
+    """Copy of tokenizer encoding without padding and truncation, like the queries and contexts of a pipeline."""
+    encoder = cast(TokenizerLoader, TokenizerLoader.from_str(tokenizer.to_str()))
+    encoder.no_padding()
+    encoder.no_truncation()
+    return encoder
+
+
+def tokenizer_fingerprint(encoder: TokenizerLoader) -> str:
+    """Digest of an encoder's definition. Indexes are only read by pipelines with the same one."""
+    return hashlib.sha256(encoder.to_str().encode("utf-8")).hexdigest()
+
+
+def build_index(
+    path: Path, texts: Iterable[str], tokenizer: "Tokenizer", chunk_size: int = 1024
+) -> "CorpusIndex":
+    """
+    Tokenize a corpus into a memory-mappable index file. Token ids of each document are stored
+    without special tokens or truncation, followed by an offset table and JSON metadata.
+    The file is written next to path and renamed once complete.
+    @param path: Index file path.
+    @param texts: Document texts. Document ids are their positions.
+    @param tokenizer: `Tokenizer` class instance of the model the index is read with.
+    @param chunk_size: Documents tokenized at once.
+    """
+    path = Path(path)
+    encoder = part_encoder(tokenizer.instance)
+    dtype = np.dtype("<u2" if encoder.get_vocab_size() <= np.iinfo(np.uint16).max + 1 else "<i4")
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    lengths: list[np.ndarray] = []
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(bytes(HEADER_SIZE))
+            chunk: list[str] = []
+            for text in texts:
+                if not isinstance(text, str):
+                    raise TypeError("Documents must be strings.")
+                chunk.append(text)
+                if len(chunk) == chunk_size:
+                    lengths.append(_write_chunk(handle, encoder, chunk, dtype))
+                    chunk = []
+            if chunk:
+                lengths.append(_write_chunk(handle, encoder, chunk, dtype))
+
+            all_lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+            offsets = np.zeros(len(all_lengths) + 1, dtype="<i8")
+            np.cumsum(all_lengths, out=offsets[1:])
+            handle.write(bytes(-handle.tell() % 8))
+            metadata = {
+                "model": tokenizer.model_id,
+                "tokenizer": tokenizer_fingerprint(encoder),
+                "documents": len(all_lengths),
+                "tokens": int(offsets[-1]),
+                "dtype": dtype.str,
+                "tokens_offset": HEADER_SIZE,
+                "offsets_offset": handle.tell(),
+            }
+            handle.write(offsets.tobytes())
+            metadata_offset = handle.tell()
+            encoded = json.dumps(metadata).encode("utf-8")
+            handle.write(encoded)
+            handle.seek(0)
+            handle.write(HEADER.pack(MAGIC, metadata_offset, len(encoded)))
+        os.replace(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    return CorpusIndex(path)
+
+
+def _write_chunk(handle, encoder: TokenizerLoader, texts: list[str], dtype: np.dtype) -> np.ndarray:
+    """Append token ids of texts and return their lengths."""
+    encodings = encoder.encode_batch(texts, add_special_tokens=False)
+    lengths = np.fromiter(map(len, encodings), dtype=np.int64, count=len(encodings))
+    ids = np.fromiter(
+        (token for encoding in encodings for token in encoding.ids), dtype=dtype, count=int(lengths.sum()))
+    handle.write(ids.tobytes())
+    return lengths
+
+
+class CorpusIndex:
+    """
+    Memory-mapped token ids of a fixed corpus built by `swiftrank index` or `build_index`.
+    Rerank documents by id with `ReRankPipeline.invoke_index`.
+
+    Example:
+    ```python
+    from swiftrank import ReRankPipeline, CorpusIndex
+    index = CorpusIndex("corpus.idx")
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2")
+    pipeline.invoke_index(query="<query>", index=index, doc_ids=[3, 14, 15], top_k=2)
+    ```
+    """
+    def __init__(self, path: Path) -> None:
+        """
+        Open an index file.
+        @param path: Index file path.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            magic, metadata_offset, metadata_length = HEADER.unpack(handle.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{str(self.path)!r} is not a swiftrank index.")
+            handle.seek(metadata_offset)
+            self.metadata: dict[str, Any] = json.loads(handle.read(metadata_length))
+
+        self.model_id: str = self.metadata["model"]
+        self.fingerprint: str = self.metadata["tokenizer"]
+        documents, tokens = self.metadata["documents"], self.metadata["tokens"]
+        self.offsets = np.memmap(
+            self.path, dtype="<i8", mode="r", offset=self.metadata["offsets_offset"], shape=(documents + 1,))
+        # Zero sized maps are not allowed.
+        self.tokens: np.ndarray = np.empty(0, dtype=self.metadata["dtype"])
+        if tokens:
+            self.tokens = np.memmap(
+                self.path, dtype=self.metadata["dtype"], mode="r", offset=self.metadata["tokens_offset"], shape=(tokens,))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def lengths(self, doc_ids: np.ndarray) -> np.ndarray:
+        """Token lengths of documents."""
+        return self.offsets[doc_ids + 1] - self.offsets[doc_ids]
@@ -1,22 +1,89 @@
-from typing import Any, Optional
+import asyncio
+from time import perf_counter
+from typing import Any, Iterator, Optional
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, status
-from fastapi.responses import ORJSONResponse
+from fastapi import FastAPI, Request, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.exceptions import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
+from orjson import dumps
 
 from .utils import ObjectCollection, api_object_parser
+from .batching import BatchScheduler
+from .metrics import Metrics
+from .registry import PipelineRegistry
 from ..settings import MODEL_MAP
 from ..ranker import ReRankPipeline
+from ..cascade import CascadePipeline, SPEC_SEPARATOR, parse_spec
 
-server = FastAPI()
-pipeline_map: dict[str, ReRankPipeline] = {}
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    warm_up = asyncio.create_task(run_in_threadpool(preload_pipelines))
+    unload = asyncio.create_task(unload_idle_models())
+    yield
+    warm_up.cancel()
+    unload.cancel()
+    for scheduler in [*scheduler_map.values(), *retired_schedulers]:
+        await scheduler.close()
 
-def get_pipeline(__id: str):
-    if pipeline_map.get(__id) is None:
-        pipeline_map[__id] = ReRankPipeline.from_model_id(__id)
-    return pipeline_map[__id]
+server = FastAPI(lifespan=lifespan)
+metrics = Metrics()
+scheduler_map: dict[str, BatchScheduler] = {}
+retired_schedulers: list[BatchScheduler] = []
+pipeline_config = {'workers': 1, 'max_concurrency': None, 'batch_size': None}
+"""Keyword arguments used to build pipelines."""
+batching_config = {'max_batch_size': 0, 'max_wait': 0.005}
+"""Request batching limits. Batching is disabled when `max_batch_size` is 0."""
+preload_models: list[str] = []
+"""Models loaded and warmed up at startup."""
+warm_up_status: dict[str, str] = {}
+"""Warm-up state of preloaded models: `pending`, `ready` or `failed: <reason>`."""
 
+def create_pipeline(__id: str):
+    pipeline = ReRankPipeline.from_model_id(__id, **pipeline_config)
+    pipeline.add_hook(metrics.stage_hook(__id))
+    return pipeline
+
+def retire_scheduler(__id: str):
+    """Drop the scheduler of an unloaded model, so it no longer holds the pipeline. It is closed once drained."""
+    scheduler = scheduler_map.pop(__id, None)
+    if scheduler is not None:
+        retired_schedulers.append(scheduler)
+
+registry = PipelineRegistry(create_pipeline, on_evict=retire_scheduler)
+"""Resident pipelines. Limits are configured by `_serve`."""
+
+def get_pipeline(__id: str, pin: bool = False):
+    return registry.get(__id, pin=pin)
+
+def get_scheduler(__id: str, pipeline: ReRankPipeline):
+    scheduler = scheduler_map.get(__id)
+    if scheduler is None or scheduler.pipeline is not pipeline:
+        if scheduler is not None:
+            retired_schedulers.append(scheduler)
+        scheduler = scheduler_map[__id] = BatchScheduler(pipeline, **batching_config)
+    return scheduler
+
+async def unload_idle_models():
+    """Unload idle models and close schedulers of unloaded models once drained."""
+    while True:
+        timeout = registry.idle_timeout
+        await asyncio.sleep(max(0.1, min(timeout / 2, 10.0)) if timeout else 10.0)
+        registry.evict_idle()
+        for scheduler in [scheduler for scheduler in retired_schedulers if not scheduler.pending]:
+            retired_schedulers.remove(scheduler)
+            await scheduler.close()
+
+def preload_pipelines():
+    warm_up_status.update((model_id, 'pending') for model_id in preload_models)
+    for model_id in preload_models:
+        try:
+            get_pipeline(model_id, pin=True).warm_up()
+            warm_up_status[model_id] = 'ready'
+        except Exception as e:
+            warm_up_status[model_id] = f"failed: {e}"
 
 class SchemaContext(BaseModel):
     pre: Optional[str] = Field(None, description="schema for pre-processing input.")
@@ -24,35 +91,72 @@ class SchemaContext(BaseModel):
     post: Optional[str] = Field(None, description="schema for extracting field after reranking.")
     
 class RerankContext(BaseModel):
-    model: str = Field("ms-marco-TinyBERT-L-2-v2", description="model to use for reranking.")
+    model: str = Field("ms-marco-TinyBERT-L-2-v2", description="model to use for reranking, or `<cheap>><expensive>` cascade.")
     contexts: ObjectCollection = Field(..., description="contexts to rerank.")
     query: str = Field(..., description="query for reranking evaluation.")
-    threshold: Optional[float] = Field(None, ge=0.0, le=1.0, description="filter contexts using threshold.")
+    threshold: Optional[float] = Field(None, description="filter contexts using threshold.")
+    top_k: Optional[int] = Field(None, ge=1, description="get only the k most relevant contexts.")
+    map_score: bool = Field(False, description="map relevance score with context")
+    stream: bool = Field(False, description="stream results as newline delimited JSON.")
+    keep: Optional[int] = Field(None, ge=1, description="contexts rescored by the expensive model of a cascade.")
+    margin: Optional[float] = Field(None, ge=0.0, description="only rescore contexts within margin of the best cheap score.")
+    schema_: Optional[SchemaContext] = Field(default=None, alias='schema')
+
+class BatchRerankContext(BaseModel):
+    model: str = Field("ms-marco-TinyBERT-L-2-v2", description="model to use for reranking, or `<cheap>><expensive>` cascade.")
+    queries: list[str] = Field(..., description="queries for reranking evaluation.")
+    contexts: list[ObjectCollection] = Field(..., description="contexts to rerank, one collection per query.")
+    threshold: Optional[float] = Field(None, description="filter contexts of each query using threshold.")
+    top_k: Optional[int] = Field(None, ge=1, description="get only the k most relevant contexts of each query.")
     map_score: bool = Field(False, description="map relevance score with context")
+    keep: Optional[int] = Field(None, ge=1, description="contexts of each query rescored by the expensive model of a cascade.")
+    margin: Optional[float] = Field(None, ge=0.0, description="only rescore contexts within margin of the best cheap score.")
     schema_: Optional[SchemaContext] = Field(default=None, alias='schema')
 
 
+@server.middleware('http')
+async def record_http_metrics(request: Request, call_next):
+    request.state.start_time = perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    metrics.inc(
+        "swiftrank_http_requests_total", path=getattr(route, 'path', 'unmatched'), status=str(response.status_code))
+    return response
+
+@server.get('/metrics', response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@server.get('/ready', response_class=ORJSONResponse)
+def readiness_endpoint():
+    ready = all(state == 'ready' for state in warm_up_status.values()) and \
+        len(warm_up_status) == len(preload_models)
+    return ORJSONResponse(
+        {'ready': ready, 'models': warm_up_status}, 
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
 @server.get('/models', response_class=ORJSONResponse)
 def list_models():
     return list(MODEL_MAP.keys())
 
-@server.post('/rerank')
-def rerank_endpoint(ctx: RerankContext):
-    if not ctx.contexts:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="contexts field cannot be an empty array or object"
-        )
+@server.get('/models/resident', response_class=ORJSONResponse)
+def list_resident_models():
+    return {
+        'memory_bytes': registry.memory(),
+        'max_memory_bytes': registry.max_memory,
+        'max_models': registry.max_models,
+        'idle_timeout': registry.idle_timeout,
+        'models': registry.resident()
+    }
 
-    if ctx.model not in MODEL_MAP:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"{ctx.model!r} model is not available"
-        )
-    
-    schema = ctx.schema_ or SchemaContext()
+def parse_contexts(
+    contexts: ObjectCollection, query: str, schema: SchemaContext, model: str
+) -> tuple[list, list[tuple[str, str]]]:
+    """Apply pre and ctx schemas to request contexts, returning contexts and (query, context) text pairs."""
     if schema.pre is not None:
-        contexts = api_object_parser(ctx.contexts, schema=schema.pre)
+        with metrics.time_stage('parse', model=model):
+            contexts = api_object_parser(contexts, schema=schema.pre)
         if isinstance(contexts, list) and not contexts:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -61,7 +165,6 @@ def rerank_endpoint(ctx: RerankContext):
         no_list_err = "Pre-processing must result into an array of objects"
 
     else:
-        contexts = ctx.contexts
         no_list_err = "Expected an array of string or object. 'pre' schema might help"
 
     if not isinstance(contexts, list):
@@ -71,38 +174,177 @@ def rerank_endpoint(ctx: RerankContext):
         )
 
     ctx_schema = schema.ctx or '.'
-    post_schema = schema.post or '.'
-    pipeline = get_pipeline(ctx.model)
     try:
-        if ctx.map_score is False:
-            reranked = pipeline.invoke(
-                query=ctx.query, 
-                contexts=contexts, 
-                threshold=ctx.threshold,
-                key=lambda x: api_object_parser(x, ctx_schema)
-            )
-            
-            return [api_object_parser(context, post_schema) for context in reranked]
-        else:
-            reranked_tup = pipeline.invoke_with_score(
-                query=ctx.query, 
-                contexts=contexts, 
-                threshold=ctx.threshold,
-                key=lambda x: api_object_parser(x, ctx_schema)
-            )
-
-            return [
-                {'score': score, 'context': api_object_parser(context, post_schema)} 
-                for (score, context) in reranked_tup
-            ]
+        with metrics.time_stage('parse', model=model):
+            pairs = [(query, api_object_parser(context, ctx_schema)) for context in contexts]
+        if not all(isinstance(text, str) for _, text in pairs):
+            raise TypeError
     except TypeError:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail='Context processing must result into string'
         )
+    return contexts, pairs
+
+def format_items(reranked: list[tuple[float, Any]], post_schema: str, map_score: bool) -> list:
+    if map_score is False:
+        return [api_object_parser(context, post_schema) for _, context in reranked]
+    return [
+        {'score': score, 'context': api_object_parser(context, post_schema)} 
+        for (score, context) in reranked
+    ]
+
+def format_reranked(reranked: list[tuple[float, Any]], post_schema: str, map_score: bool, model: str) -> list:
+    with metrics.time_stage('postprocess', model=model):
+        return format_items(reranked, post_schema, map_score)
+
+def parse_batch(ctx: BatchRerankContext, schema: SchemaContext) -> tuple[list[list], list[tuple[str, str]]]:
+    """Parse contexts of every query, returning contexts per query and (query, context) text pairs of all queries."""
+    groups, pairs = [], []
+    for query, contexts in zip(ctx.queries, ctx.contexts):
+        if not contexts:
+            groups.append([])
+            continue
+        contexts, query_pairs = parse_contexts(contexts, query, schema, ctx.model)
+        groups.append(contexts)
+        pairs.extend(query_pairs)
+    return groups, pairs
+
+def reranked_response(
+    pipeline: ReRankPipeline | CascadePipeline, contexts: list, scores, ctx: RerankContext, schema: SchemaContext
+) -> ORJSONResponse | StreamingResponse:
+    """Rank contexts and build the response. Runs in the threadpool, off the event loop."""
+    reranked = pipeline.rank(contexts, scores, threshold=ctx.threshold, top_k=ctx.top_k)
+    if ctx.stream:
+        return StreamingResponse(
+            stream_reranked(reranked, schema.post or '.', ctx.map_score, ctx.model), media_type="application/x-ndjson"
+        )
+    return ORJSONResponse(format_reranked(reranked, schema.post or '.', ctx.map_score, ctx.model))
+
+def batch_reranked_response(
+    pipeline: ReRankPipeline | CascadePipeline, groups: list[list], scores, ctx: BatchRerankContext, schema: SchemaContext
+) -> ORJSONResponse:
+    """Rank contexts of every query and build the response. Runs in the threadpool, off the event loop."""
+    return ORJSONResponse([
+        format_reranked(reranked, schema.post or '.', ctx.map_score, ctx.model)
+        for reranked in pipeline.rank_many(groups, scores, threshold=ctx.threshold, top_k=ctx.top_k)
+    ])
+
+STREAM_CHUNK_SIZE = 256
+"""Reranked items serialized per streamed chunk."""
+
+def stream_reranked(
+    reranked: list[tuple[float, Any]], post_schema: str, map_score: bool, model: str
+) -> Iterator[bytes]:
+    """Serialize reranked items as newline delimited JSON, a chunk of items at a time."""
+    elapsed = 0.0
+    for offset in range(0, len(reranked), STREAM_CHUNK_SIZE):
+        start = perf_counter()
+        items = format_items(reranked[offset:offset + STREAM_CHUNK_SIZE], post_schema, map_score)
+        chunk = b"\n".join(map(dumps, items)) + b"\n"
+        elapsed += perf_counter() - start
+        yield chunk
+    metrics.observe("swiftrank_stage_seconds", elapsed, model=model, stage='postprocess')
+
+async def score_pairs(
+    model: str,
+    pairs: list[tuple[str, str]],
+    keep: Optional[int] = None,
+    margin: Optional[float] = None,
+    sizes: Optional[list[int]] = None
+):
+    """
+    Score pairs with a model or cascade spec, as normalized by `check_model`.
+    Cascades pick survivors per query, sizes being the pairs of each one.
+    """
+    model_ids = parse_spec(model)
+    if len(model_ids) == 2:
+        cheap, expensive = [await run_in_threadpool(get_pipeline, model_id) for model_id in model_ids]
+        pipeline = CascadePipeline(cheap, expensive, keep=keep, margin=margin)
+        with metrics.time_stage('score', model=model):
+            return pipeline, await pipeline.ascore_pairs(pairs, sizes=sizes)
+
+    model_id, = model_ids
+    pipeline = await run_in_threadpool(get_pipeline, model_id)
+    with metrics.time_stage('score', model=model_id):
+        if batching_config['max_batch_size'] > 0:
+            return pipeline, await get_scheduler(model_id, pipeline).score_pairs(pairs)
+        return pipeline, await pipeline.ascore_pairs(pairs)
+
+def check_model(model: str) -> str:
+    """Validate a model or cascade spec and return it normalized, as used for loading and metrics."""
+    try:
+        model_ids = parse_spec(model)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.args[0])
+    for model_id in model_ids:
+        if model_id not in MODEL_MAP:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{model_id!r} model is not available"
+            )
+    return SPEC_SEPARATOR.join(model_ids)
+
+@server.post('/rerank', response_class=ORJSONResponse)
+async def rerank_endpoint(ctx: RerankContext, request: Request):
+    if not ctx.contexts:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="contexts field cannot be an empty array or object"
+        )
+
+    ctx.model = check_model(ctx.model)
+    metrics.inc("swiftrank_requests_total", model=ctx.model)
+    metrics.observe(
+        "swiftrank_stage_seconds", perf_counter() - request.state.start_time, model=ctx.model, stage='validation')
+    schema = ctx.schema_ or SchemaContext()
+    # Parsing, ranking and formatting run in the threadpool, only scoring is awaited on the event loop.
+    contexts, pairs = await run_in_threadpool(parse_contexts, ctx.contexts, ctx.query, schema, ctx.model)
+    pipeline, scores = await score_pairs(ctx.model, pairs, keep=ctx.keep, margin=ctx.margin)
+    return await run_in_threadpool(reranked_response, pipeline, contexts, scores, ctx, schema)
+
+@server.post('/rerank/batch', response_class=ORJSONResponse)
+async def batch_rerank_endpoint(ctx: BatchRerankContext, request: Request):
+    if not ctx.queries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="queries field cannot be an empty array"
+        )
+    if len(ctx.queries) != len(ctx.contexts):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="queries and contexts fields must have the same length"
+        )
+
+    ctx.model = check_model(ctx.model)
+    metrics.inc("swiftrank_requests_total", model=ctx.model)
+    metrics.observe(
+        "swiftrank_stage_seconds", perf_counter() - request.state.start_time, model=ctx.model, stage='validation')
+    schema = ctx.schema_ or SchemaContext()
+    groups, pairs = await run_in_threadpool(parse_batch, ctx, schema)
+    pipeline, scores = await score_pairs(
+        ctx.model, pairs, keep=ctx.keep, margin=ctx.margin, sizes=[len(contexts) for contexts in groups])
+    return await run_in_threadpool(batch_reranked_response, pipeline, groups, scores, ctx, schema)
     
-def _serve(host: str, port: int):
+def _serve(
+    host: str, 
+    port: int, 
+    workers: int = 1, 
+    max_concurrency: Optional[int] = None, 
+    batch_size: Optional[int] = None,
+    max_batch_size: int = 0, 
+    max_wait_ms: float = 5.0,
+    preload: Optional[list[str]] = None,
+    max_models: Optional[int] = None,
+    max_memory_mb: Optional[float] = None,
+    idle_timeout: Optional[float] = None
+):
     import uvicorn
+    pipeline_config.update(workers=workers, max_concurrency=max_concurrency, batch_size=batch_size)
+    registry.sessions, registry.max_models, registry.idle_timeout = workers, max_models, idle_timeout
+    registry.max_memory = None if max_memory_mb is None else int(max_memory_mb * 1024 * 1024)
+    preload_models[:] = dict.fromkeys(preload or [])
+    batching_config.update(max_batch_size=max_batch_size, max_wait=max_wait_ms / 1000)
     try:
         uvicorn.run(server, host=host, port=port)
     except KeyboardInterrupt:
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from ..ranker import ReRankPipeline
+
+
+class BatchScheduler:
+    """
+    Merge (query, context) pairs of concurrent requests into shared inference calls.
+
+    Pairs are queued until `max_batch_size` pairs are collected or `max_wait` seconds
+    have passed since the first queued request, then scored in one pipeline call and
+    fanned back out to each request.
+    """
+    def __init__(
+        self, pipeline: ReRankPipeline, max_batch_size: int = 64, max_wait: float = 0.005
+    ) -> None:
+        """
+        Initialize a batch scheduler
+        @param pipeline: `ReRankPipeline` class instance
+        @param max_batch_size: Max number of pairs merged into one inference call.
+        @param max_wait: Max seconds to wait for more requests before running a batch.
+        """
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__worker: Optional[asyncio.Task] = None
+        self.__pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of requests waiting for their scores."""
+        return self.__pending
+
+    async def score_pairs(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """
+        Compute relevance scores of pairs within a shared batch.
+        @param pairs: (query, context) text pairs.
+        """
+        loop = asyncio.get_running_loop()
+        if self.__loop is not loop or self.__worker.done():
+            self.__loop, self.__queue = loop, asyncio.Queue()
+            self.__worker = loop.create_task(self.__run())
+
+        future = loop.create_future()
+        self.__pending += 1
+        try:
+            await self.__queue.put((pairs, future))
+            return await future
+        finally:
+            self.__pending -= 1
+
+    async def close(self) -> None:
+        """Stop the batching worker."""
+        if self.__worker is not None and self.__loop is asyncio.get_running_loop():
+            self.__worker.cancel()
+            try:
+                await self.__worker
+            except asyncio.CancelledError:
+                pass
+        self.__loop = self.__worker = None
+
+    async def __collect(self) -> list[tuple[list, asyncio.Future]]:
+        """Collect queued jobs up to max batch size or max wait time."""
+        loop = asyncio.get_running_loop()
+        jobs = [await self.__queue.get()]
+        size, deadline = len(jobs[0][0]), loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(self.__queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+            jobs.append(job)
+            size += len(job[0])
+        return [(pairs, future) for pairs, future in jobs if not future.done()]
+
+    async def __run(self) -> None:
+        """Run merged batches until cancelled."""
+        while True:
+            jobs = await self.__collect()
+            if not jobs:
+                continue
+
+            merged = [pair for pairs, _ in jobs for pair in pairs]
+            # Scored like unbatched requests: on the pipeline executor, within its concurrency limit.
+            try:
+                scores = await self.pipeline.ascore_pairs(merged)
+            except Exception as e:
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for pairs, future in jobs:
+                if not future.done():
+                    future.set_result(scores[offset:offset + len(pairs)])
+                offset += len(pairs)
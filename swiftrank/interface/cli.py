@@ -1,4 +1,5 @@
-from typing import Annotated
+import sys
+from typing import Annotated, Literal
 
 from cyclopts import App, Parameter, validators
 
@@ -21,33 +22,20 @@ def build_processing_parameters(
         help="schema for extracting context.", show_default=False)] = '.',
     post: Annotated[str, Parameter(name=('-p', '--post'),
         help="schema for extracting field after reranking.", show_default=False
+    )] = None,
+    fmt: Annotated[Literal['json', 'jsonl', 'yaml'], Parameter(name=('--format',),
+        help="input format, sniffed from input if not provided.", show_default=False
     )] = None
 ):  
-    from .utils import cli_object_parser, print_and_exit
+    from .utils import load_input, cli_object_parser, print_and_exit
     def preprocessor(_input: str):
-        if _input.startswith(('{', '[')):
-            from orjson import loads, JSONDecodeError
-            try:
-                return cli_object_parser(loads(_input), pre)
-            except JSONDecodeError:
-                try:
-                    from io import StringIO
-                    with StringIO(_input) as handler:
-                        return list(map(loads, handler))
-                except (JSONDecodeError, Exception):
-                    print_and_exit("Input data format not valid.", code=1)
-            except Exception:
-                print_and_exit("Input data format not valid.", code=1)
-        
-        import yaml    
         try:
-            return cli_object_parser(yaml.safe_load(_input), pre)
-        except yaml.MarkedYAMLError:
-            return list(yaml.safe_load_all(_input))
-        except yaml.YAMLError:
+            data, documents = load_input(_input, fmt)
+        except ValueError:
             print_and_exit("Input data format not valid.", code=1)
+        return data if documents else cli_object_parser(data, pre)
     
-    return {'preprocessor': preprocessor, 'ctx_schema': ctx, 'post_schema': post}
+    return {'preprocessor': preprocessor, 'pre_schema': pre, 'ctx_schema': ctx, 'post_schema': post, 'format': fmt}
 
 
 @app.meta.default
@@ -56,12 +44,27 @@ def __entry__(
     query: Annotated[str, Parameter(
         name=("-q", "--query"), help="query for reranking evaluation.")],
     threshold: Annotated[float, Parameter(
-        name=("-t", "--threshold"), help="filter contexts using threshold.", validator=validators.Number(gte=0.0, lte=1.0))] = None,
+        name=("-t", "--threshold"), help="filter contexts using threshold.")] = None,
+    top_k: Annotated[int, Parameter(
+        name=("-k", "--top-k"), help="get k most relevant contexts.", validator=validators.Number(gte=1))] = None,
     first: Annotated[bool, Parameter(
         name=("-f", "--first"), help="get most relevant context.", negative="", show_default=False)] = False,
+    stream: Annotated[bool, Parameter(
+        name=("-s", "--stream"), help="rerank lines or jsonlines incrementally with constant memory.", negative="", show_default=False)] = False,
+    chunk_size: Annotated[int, Parameter(
+        name=("--chunk-size",), help="contexts scored per chunk in stream mode.", validator=validators.Number(gte=1))] = 256,
 ):
     from .utils import read_stdin, cli_object_parser, print_and_exit
     
+    if stream:
+        return _stream_rerank(
+            query=query, 
+            threshold=threshold, 
+            top_k=1 if first else top_k, 
+            chunk_size=chunk_size,
+            processing_params=app(tokens=tokens) if tokens else {}
+        )
+
     processing_params: dict = {}
     if tokens:
         processing_params = app(tokens=tokens)
@@ -82,22 +85,18 @@ def __entry__(
         print_and_exit("Nothing to rerank!", code=1)
 
     from .. import settings
-    from ..ranker import ReRankPipeline
+    from .daemon import DaemonError, load_pipeline
 
-    pipeline = ReRankPipeline.from_model_id(settings.DEFAULT_MODEL)
+    pipeline = load_pipeline(settings.DEFAULT_MODEL)
     try:
         reranked = pipeline.invoke(
             query=query, 
             contexts=contexts, 
             threshold=threshold, 
+            top_k=1 if first else top_k,
             key=lambda x: cli_object_parser(x, ctx_schema)
         )
 
-        if reranked and first:
-            print_and_exit(
-                cli_object_parser(reranked[0], post_schema)
-            )
-            
         for context in reranked:
             print(cli_object_parser(context, post_schema))
 
@@ -105,6 +104,75 @@ def __entry__(
         print_and_exit(
             'Context processing must result into string.', code=1
         )
+    except DaemonError as e:
+        print_and_exit(f"swiftrank daemon: {e}", code=1)
+
+def _stream_rerank(
+    query: str, threshold: float | None, top_k: int | None, chunk_size: int, processing_params: dict
+):
+    """
+    Rerank stdin chunk by chunk. Keeps a bounded top-k heap when top_k is given, 
+    otherwise prints contexts passing threshold as each chunk is scored.
+    """
+    import heapq
+    from itertools import islice, count
+    from .utils import iter_stdin, cli_object_parser, print_and_exit
+
+    if top_k is None and threshold is None:
+        print_and_exit("Stream mode requires --top-k, --first or --threshold.", code=1)
+    if processing_params.get('format') in ('json', 'yaml'):
+        print_and_exit("Stream mode reads lines or jsonlines.", code=1)
+    if processing_params.get('pre_schema', '.') != '.':
+        print_and_exit("Stream mode reads one context per line, --pre is not supported.", code=1)
+    
+    ctx_schema = processing_params.get('ctx_schema', '.')
+    post_schema = processing_params.get('post_schema') or ctx_schema
+    loads = None
+    if processing_params:
+        from orjson import loads
+
+    from .. import settings
+    from .daemon import DaemonError, load_pipeline
+
+    pipeline = load_pipeline(settings.DEFAULT_MODEL)
+    heap: list[tuple[float, int, object]] = []
+    sequence, lines = count(), iter_stdin()
+    while chunk := list(islice(lines, chunk_size)):
+        try:
+            contexts = chunk if loads is None else [loads(line) for line in chunk if line.strip()]
+        except Exception:
+            print_and_exit("Input data format not valid.", code=1)
+        try:
+            reranked = pipeline.invoke_with_score(
+                query=query, 
+                contexts=contexts, 
+                threshold=threshold, 
+                top_k=top_k, 
+                key=lambda x: cli_object_parser(x, ctx_schema)
+            )
+        except TypeError:
+            print_and_exit(
+                'Context processing must result into string.', code=1
+            )
+        except DaemonError as e:
+            print_and_exit(f"swiftrank daemon: {e}", code=1)
+
+        if top_k is None:
+            for _, context in reranked:
+                print(cli_object_parser(context, post_schema))
+            sys.stdout.flush()
+            continue
+
+        for score, context in reranked:
+            # Negated sequence keeps earlier contexts on ties, like a stable sort.
+            item = (score, -next(sequence), context)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+    for _, _, context in sorted(heap, key=lambda item: item[:2], reverse=True):
+        print(cli_object_parser(context, post_schema))
 
 @app.meta.command(name="serve", help="Startup a swiftrank server")
 def serve(
@@ -112,10 +180,197 @@ def serve(
     host: Annotated[str, Parameter(
         name=('--host'), help="Host name")] = '0.0.0.0',
     port: Annotated[int, Parameter(
-        name=('--port',), help="Port number.")] = 12345
+        name=('--port',), help="Port number.")] = 12345,
+    intra_op_threads: Annotated[int, Parameter(
+        name=('--intra-op-threads',), help="Threads used within operators.", 
+        validator=validators.Number(gte=0), show_default=False)] = None,
+    inter_op_threads: Annotated[int, Parameter(
+        name=('--inter-op-threads',), help="Threads used across operators.", 
+        validator=validators.Number(gte=0), show_default=False)] = None,
+    graph_optimization: Annotated[Literal['disable', 'basic', 'extended', 'all'], Parameter(
+        name=('--graph-optimization',), help="Graph optimization level.", show_default=False)] = None,
+    execution_mode: Annotated[Literal['sequential', 'parallel'], Parameter(
+        name=('--execution-mode',), help="Execution mode.", show_default=False)] = None,
+    mem_arena: Annotated[bool, Parameter(
+        name=('--mem-arena',), help="Use CPU memory arena.", show_default=False)] = None,
+    save_optimized: Annotated[bool, Parameter(
+        name=('--save-optimized',), help="Save optimized graph into model cache.", show_default=False)] = None,
+    workers: Annotated[int, Parameter(
+        name=('--workers',), help="Inference sessions per model scoring shards concurrently.", 
+        validator=validators.Number(gte=1))] = 1,
+    max_concurrency: Annotated[int, Parameter(
+        name=('--max-concurrency',), help="Max requests scored at once per model (twice the workers if unset).", 
+        validator=validators.Number(gte=1), show_default=False)] = None,
+    batch_size: Annotated[int, Parameter(
+        name=('--batch-size',), help="Max pairs per inference call, bucketed by token length (all at once if unset).", 
+        validator=validators.Number(gte=1), show_default=False)] = None,
+    max_batch_size: Annotated[int, Parameter(
+        name=('--max-batch-size',), help="Max pairs merged across concurrent requests (0 disables batching).", 
+        validator=validators.Number(gte=0))] = 0,
+    max_wait_ms: Annotated[float, Parameter(
+        name=('--max-wait-ms',), help="Max milliseconds to wait for a batch to fill.", 
+        validator=validators.Number(gte=0))] = 5.0,
+    preload: Annotated[list[str], Parameter(
+        name=('--preload',), negative=(), help="Models to load and warm up at startup. Readiness is reported at /ready.", 
+        show_default=False)] = None,
+    max_models: Annotated[int, Parameter(
+        name=('--max-models',), help="Max resident models. Least recently used are unloaded first.", 
+        validator=validators.Number(gte=1), show_default=False)] = None,
+    max_memory_mb: Annotated[float, Parameter(
+        name=('--max-memory-mb',), help="Memory budget of resident models in MiB.", 
+        validator=validators.Number(gt=0), show_default=False)] = None,
+    idle_timeout: Annotated[float, Parameter(
+        name=('--idle-timeout',), help="Seconds after which an unused model is unloaded.", 
+        validator=validators.Number(gt=0), show_default=False)] = None
 ):
+    from .. import settings
+    from .utils import print_and_exit
+    for model_id in preload or []:
+        if model_id not in settings.MODEL_MAP:
+            print_and_exit(f"{model_id!r} model is not available.", code=1)
+    if intra_op_threads is not None:
+        settings.INTRA_OP_NUM_THREADS = intra_op_threads
+    if inter_op_threads is not None:
+        settings.INTER_OP_NUM_THREADS = inter_op_threads
+    if graph_optimization is not None:
+        settings.GRAPH_OPTIMIZATION_LEVEL = graph_optimization
+    if execution_mode is not None:
+        settings.EXECUTION_MODE = execution_mode
+    if mem_arena is not None:
+        settings.ENABLE_MEM_ARENA = mem_arena
+    if save_optimized is not None:
+        settings.SAVE_OPTIMIZED_MODEL = save_optimized
+
     from .api import _serve
-    _serve(host=host, port=port)
+    _serve(
+        host=host, port=port, workers=workers, max_concurrency=max_concurrency, 
+        batch_size=batch_size, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, preload=preload,
+        max_models=max_models, max_memory_mb=max_memory_mb, idle_timeout=idle_timeout
+    )
+
+@app.meta.command(name="optimize", help="Create reduced precision model variants with a benchmark report")
+def optimize(
+    model_id: Annotated[str, Parameter(
+        name=('MODEL',), help="Model ID (default model if not provided).", show_default=False)] = None,
+    *,
+    variant: Annotated[list[Literal['int8', 'fp16']], Parameter(
+        name=('--variant',), negative=(), show_default=False,
+        help="Variants to create (all if not provided). fp16 only stores weights in half precision, "
+        "they are cast back to float32 at load and inference still computes in float32.")] = None,
+    force: Annotated[bool, Parameter(
+        name=('--force',), help="Recreate existing variants.", negative="", show_default=False)] = False,
+    repeat: Annotated[int, Parameter(
+        name=('--repeat',), help="Timed benchmark runs per model.", validator=validators.Number(gte=1))] = 10
+):
+    from .. import settings
+    from .utils import print_and_exit
+
+    model_id = model_id or settings.DEFAULT_MODEL
+    if model_id not in settings.MODEL_MAP:
+        print_and_exit(f"{model_id!r} model is not available.", code=1)
+
+    from orjson import dumps, OPT_INDENT_2
+    from ..optimize import optimize as create_variant, load_report
+    for name in dict.fromkeys(variant or settings.MODEL_VARIANTS):
+        report = None if force else load_report(model_id, name)
+        if report is not None:
+            print(f"{name!r} variant already created, pass --force to recreate it.", file=sys.stderr)
+        else:
+            try:
+                report = create_variant(model_id, name, force=force, repeat=repeat)
+            except ImportError as e:
+                print_and_exit(str(e), code=1)
+        print(dumps(report, option=OPT_INDENT_2).decode())
+
+@app.meta.command(name="index", help="Tokenize a corpus on stdin into a memory-mapped index. [ lines | jsonl ]")
+def index(
+    output: Annotated[str, Parameter(
+        name=('OUTPUT',), help="Index file path.")],
+    *,
+    ctx: Annotated[str, Parameter(name=('-c', '--ctx'),
+        help="schema for extracting context from jsonlines (plain lines if not provided).", show_default=False)] = None,
+    model_id: Annotated[str, Parameter(
+        name=('--model',), help="Model ID (default model if not provided).", show_default=False)] = None,
+    chunk_size: Annotated[int, Parameter(
+        name=("--chunk-size",), help="documents tokenized per chunk.", validator=validators.Number(gte=1))] = 1024
+):
+    from .. import settings
+    from .utils import iter_stdin, cli_object_parser, print_and_exit
+
+    model_id = model_id or settings.DEFAULT_MODEL
+    if model_id not in settings.MODEL_MAP:
+        print_and_exit(f"{model_id!r} model is not available.", code=1)
+
+    def documents():
+        if ctx is None:
+            yield from iter_stdin()
+            return
+        from orjson import loads
+        for line in iter_stdin():
+            if not line.strip():
+                continue
+            try:
+                obj = loads(line)
+            except Exception:
+                print_and_exit("Input data format not valid.", code=1)
+            yield cli_object_parser(obj, ctx)
+
+    from ..ranker import Tokenizer
+    from ..index import build_index
+    try:
+        corpus = build_index(output, documents(), Tokenizer(model_id=model_id), chunk_size=chunk_size)
+    except TypeError:
+        print_and_exit('Context processing must result into string.', code=1)
+    except OSError as e:
+        print_and_exit(str(e), code=1)
+    print_and_exit(f"Indexed {len(corpus)} documents into {output!r}.")
+
+@app.meta.command(name="daemon",help="Keep pipelines loaded for CLI invocations on a Unix socket")
+def daemon(
+    *,
+    workers: Annotated[int, Parameter(
+        name=('--workers',), help="Inference sessions per model scoring shards concurrently.",
+        validator=validators.Number(gte=1))] = 1,
+    preload: Annotated[list[str], Parameter(
+        name=('--preload',), negative=(), help="Models to load and warm up at startup.",
+        show_default=False)] = None,
+    idle_timeout: Annotated[float, Parameter(
+        name=('--idle-timeout',), help="Seconds after which an unused model is unloaded.",
+        validator=validators.Number(gt=0), show_default=False)] = None,
+    status: Annotated[bool, Parameter(
+        name=('--status',), help="Show whether a daemon is running and its loaded models.",
+        negative="", show_default=False)] = False,
+    stop: Annotated[bool, Parameter(
+        name=('--stop',), help="Stop the running daemon.", negative="", show_default=False)] = False
+):
+    from .. import settings
+    from .utils import print_and_exit
+    from .daemon import DaemonError, RemotePipeline, _serve_daemon
+
+    if status or stop:
+        remote = RemotePipeline.connect(settings.DEFAULT_MODEL, settings.DAEMON_SOCKET)
+        if remote is None:
+            print_and_exit("swiftrank daemon is not running.", code=1)
+        try:
+            response = remote.request({'op': 'shutdown' if stop else 'ping'})
+        except DaemonError as e:
+            print_and_exit(f"swiftrank daemon: {e}", code=1)
+        finally:
+            remote.close()
+        if stop:
+            print_and_exit(f"swiftrank daemon (pid {response['pid']}) stopped.")
+        print_and_exit(
+            f"swiftrank daemon (pid {response['pid']}) listening on {str(settings.DAEMON_SOCKET)!r}, "
+            f"models: {', '.join(response['models']) or 'none'}"
+        )
+
+    for model_id in preload or []:
+        if model_id not in settings.MODEL_MAP:
+            print_and_exit(f"{model_id!r} model is not available.", code=1)
+    try:
+        _serve_daemon(settings.DAEMON_SOCKET, workers=workers, preload=preload, idle_timeout=idle_timeout)
+    except OSError as e:
+        print_and_exit(str(e), code=1)
 
 if __name__ == "__main__":
     app.meta()
\ No newline at end of file
@@ -0,0 +1,235 @@
+import os
+import socket
+import threading
+import socketserver
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from orjson import dumps, loads
+
+CONNECT_TIMEOUT = 0.5
+"""Seconds to wait for a daemon to accept a connection"""
+
+
+class DaemonError(RuntimeError):
+    """Request rejected by the daemon."""
+
+
+class RemotePipeline:
+    """
+    Client of a running swiftrank daemon exposing the `ReRankPipeline.invoke` interface.
+    Contexts are mapped to strings locally, so only strings cross the socket and the
+    daemon answers with scores and indices of the selected contexts.
+    """
+    def __init__(self, connection: socket.socket, model_id: str) -> None:
+        """
+        Initialize a remote pipeline over a connected socket.
+        @param connection: Socket connected to the daemon.
+        @param model_id: Model ID used for reranking.
+        """
+        self.model_id = model_id
+        self.__connection = connection
+        self.__reader = connection.makefile('rb')
+
+    @classmethod
+    def connect(cls, model_id: str, path: Path) -> Optional["RemotePipeline"]:
+        """
+        Connect to the daemon listening on path.
+        @param model_id: Model ID used for reranking.
+        @param path: Unix socket path of the daemon.
+        @return: None if no daemon is running.
+        """
+        if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+            return None
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.settimeout(CONNECT_TIMEOUT)
+            connection.connect(str(path))
+            connection.settimeout(None)
+        except OSError:
+            connection.close()
+            return None
+        return cls(connection, model_id)
+
+    def request(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """Send one request and wait for its response. Lost connections raise `DaemonError` too."""
+        try:
+            self.__connection.sendall(dumps(payload) + b"\n")
+            line = self.__reader.readline()
+        except OSError as e:
+            raise DaemonError(f"connection lost ({e})") from e
+        if not line:
+            raise DaemonError("closed the connection.")
+        response = loads(line)
+        if 'error' in response:
+            raise DaemonError(response['error'])
+        return response
+
+    def invoke_with_score(
+        self,
+        query: str,
+        contexts: Iterable,
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        *,
+        key: Callable = None
+    ) -> list[tuple]:
+        """
+        Rerank contexts based on query.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts object.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        @param key: callback to use for getting fields from contexts object.
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+
+        contexts = contexts if isinstance(contexts, list) else list(contexts)
+        texts = contexts if key is None else [key(context) for context in contexts]
+        if not all(isinstance(text, str) for text in texts):
+            raise TypeError("Contexts must be strings.")
+
+        response = self.request({
+            'op': 'rank', 'model': self.model_id, 'query': query,
+            'contexts': texts, 'threshold': threshold, 'top_k': top_k
+        })
+        return [(score, contexts[idx]) for score, idx in response['ranked']]
+
+    def invoke(
+        self,
+        query: str,
+        contexts: Iterable,
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        *,
+        key: Callable = None
+    ) -> list:
+        """
+        Rerank contexts based on query.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts object.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        @param key: callback to use for getting fields from contexts object.
+        """
+        return [
+            context for _, context in self.invoke_with_score(query, contexts, threshold, top_k, key=key)
+        ]
+
+    def close(self) -> None:
+        self.__reader.close()
+        self.__connection.close()
+
+
+def load_pipeline(model_id: str):
+    """
+    Get a pipeline of model: the running daemon when there is one,
+    otherwise a pipeline loaded in this process.
+    @param model_id: Model ID
+    """
+    from .. import settings
+    if settings.USE_DAEMON:
+        remote = RemotePipeline.connect(model_id, settings.DAEMON_SOCKET)
+        if remote is not None:
+            return remote
+
+    from ..ranker import ReRankPipeline
+    return ReRankPipeline.from_model_id(model_id)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(loads(line))
+            except Exception as e:
+                response = {'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(dumps(response) + b"\n")
+            self.wfile.flush()
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, get_pipeline: Callable, resident: Callable[[], list[str]]) -> None:
+        self.get_pipeline, self.resident = get_pipeline, resident
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(str(path), _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+
+    def dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get('op')
+        if op == 'ping':
+            return {'pid': os.getpid(), 'models': self.resident()}
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'pid': os.getpid()}
+        if op != 'rank':
+            raise ValueError(f"{op!r} operation is not supported.")
+
+        from ..settings import MODEL_MAP
+        if request['model'] not in MODEL_MAP:
+            raise ValueError(f"{request['model']!r} model is not available.")
+        pipeline = self.get_pipeline(request['model'])
+        query, texts = request['query'], request['contexts']
+        scores = pipeline.score_pairs([(query, text) for text in texts])
+        ranked = pipeline.rank(
+            range(len(texts)), scores, threshold=request.get('threshold'), top_k=request.get('top_k')
+        )
+        return {'ranked': ranked}
+
+
+def _serve_daemon(
+    path: Path,
+    workers: int = 1,
+    preload: Optional[list[str]] = None,
+    idle_timeout: Optional[float] = None
+) -> None:
+    """
+    Serve reranking on a Unix socket, keeping pipelines loaded between CLI invocations.
+    @param path: Unix socket path.
+    @param workers: Inference sessions per model.
+    @param preload: Models to load and warm up before accepting requests.
+    @param idle_timeout: Seconds after which an unused model is unloaded.
+    """
+    from signal import signal, SIGTERM
+    from .registry import PipelineRegistry
+    from ..ranker import ReRankPipeline
+
+    if os.path.exists(path):
+        remote = RemotePipeline.connect('', path)
+        if remote is not None:
+            remote.close()
+            raise OSError(f"swiftrank daemon is already listening on {str(path)!r}.")
+        os.unlink(path)
+
+    registry = PipelineRegistry(
+        lambda model_id: ReRankPipeline.from_model_id(model_id, workers=workers),
+        idle_timeout=idle_timeout, sessions=workers
+    )
+    for model_id in dict.fromkeys(preload or []):
+        registry.get(model_id, pin=True).warm_up()
+
+    server = _DaemonServer(
+        path, registry.get, lambda: [entry['model'] for entry in registry.resident()]
+    )
+    stopped = threading.Event()
+    def unload_idle_models() -> None:
+        while not stopped.wait(min(idle_timeout / 2, 30.0)):
+            registry.evict_idle()
+
+    if idle_timeout is not None:
+        threading.Thread(target=unload_idle_models, daemon=True).start()
+    signal(SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,116 @@
+import threading
+from time import perf_counter
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+from ..ranker import StageHook
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms rendered in Prometheus text format.
+
+    Metrics:
+    - `swiftrank_http_requests_total{path, status}`
+    - `swiftrank_requests_total{model}`
+    - `swiftrank_pairs_total{model}`
+    - `swiftrank_tokens_total{model}`
+    - `swiftrank_batch_size{model}` pairs per inference call
+    - `swiftrank_stage_seconds{model, stage}` latency per server and pipeline stage
+    """
+    HELP = {
+        "swiftrank_http_requests_total": ("counter", "HTTP requests by path and status code."),
+        "swiftrank_requests_total": ("counter", "Rerank requests by model."),
+        "swiftrank_pairs_total": ("counter", "Tokenized (query, context) pairs by model."),
+        "swiftrank_tokens_total": ("counter", "Tokens of tokenized pairs by model."),
+        "swiftrank_batch_size": ("histogram", "Pairs per inference call."),
+        "swiftrank_stage_seconds": ("histogram", "Latency of server and pipeline stages."),
+    }
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__counters: dict[str, dict[Labels, float]] = {}
+        self.__histograms: dict[str, dict[Labels, _Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increment a counter."""
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            series = self.__counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str) -> None:
+        """Record a histogram observation."""
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            series = self.__histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    @contextmanager
+    def time_stage(self, stage: str, model: str) -> Iterator[None]:
+        """Record latency of a server stage."""
+        start = perf_counter()
+        yield
+        self.observe("swiftrank_stage_seconds", perf_counter() - start, model=model, stage=stage)
+
+    def stage_hook(self, model: str) -> StageHook:
+        """Create a `ReRankPipeline` stage hook recording latencies and sizes of model."""
+        def hook(stage: str, seconds: float, sizes: dict[str, int]) -> None:
+            self.observe("swiftrank_stage_seconds", seconds, model=model, stage=stage)
+            if stage == 'tokenize':
+                self.inc("swiftrank_pairs_total", sizes.get('pairs', 0), model=model)
+                self.inc("swiftrank_tokens_total", sizes.get('tokens', 0), model=model)
+            elif stage == 'inference':
+                self.observe("swiftrank_batch_size", sizes.get('batch_size', 0), buckets=SIZE_BUCKETS, model=model)
+        return hook
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        lines = []
+        with self.__lock:
+            for name, series in self.__counters.items():
+                lines.extend(self.__header(name))
+                for labels, value in series.items():
+                    lines.append(f"{name}{self.__format_labels(labels)} {value:g}")
+
+            for name, series in self.__histograms.items():
+                lines.extend(self.__header(name))
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, float('inf')), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                        lines.append(f"{name}_bucket{self.__format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self.__format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{self.__format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def __header(self, name: str) -> list[str]:
+        kind, description = self.HELP.get(name, ("untyped", name))
+        return [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+
+    @staticmethod
+    def __format_labels(labels: Labels) -> str:
+        if not labels:
+            return ''
+        escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
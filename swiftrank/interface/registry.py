@@ -0,0 +1,183 @@
+import threading
+from time import monotonic
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .. import settings
+from ..ranker import ReRankPipeline
+
+
+def estimate_footprint(model_id: str, sessions: int = 1) -> int:
+    """
+    Estimate resident bytes of a pipeline from its files: model weights once per
+    inference session plus the tokenizer definition.
+    @param model_id: Model ID
+    @param sessions: Number of inference sessions of the pipeline.
+    """
+    model_dir = settings.get_model_path(model_id=model_id)
+    weights = (model_dir / settings.MODEL_MAP[model_id]).stat().st_size
+    tokenizer = (model_dir / "tokenizer.json").stat().st_size
+    return weights * sessions + tokenizer
+
+
+class _Entry:
+    def __init__(self, pipeline: ReRankPipeline, footprint: int, pinned: bool) -> None:
+        self.pipeline = pipeline
+        self.footprint = footprint
+        self.pinned = pinned
+        self.loaded_at = self.last_used = monotonic()
+
+
+class PipelineRegistry:
+    """
+    Resident pipelines by model id, bounded by number of models and memory budget.
+    Least recently used models are evicted to make room for new ones once these are
+    loaded, and models unused for `idle_timeout` seconds are unloaded by `evict_idle`. 
+    Models being loaded hold a slot counted against `max_models`, their footprint is
+    estimated once loaded. Pinned models are never evicted.
+    """
+    def __init__(
+        self,
+        factory: Callable[[str], ReRankPipeline],
+        max_models: Optional[int] = None,
+        max_memory: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        sessions: int = 1,
+        on_evict: Optional[Callable[[str], None]] = None,
+        estimator: Optional[Callable[[str], int]] = None
+    ) -> None:
+        """
+        Initialize a pipeline registry
+        @param factory: Callback building a pipeline from model id.
+        @param max_models: Max number of resident models. Unbounded if not provided.
+        @param max_memory: Memory budget of resident models in bytes. Unbounded if not provided.
+        @param idle_timeout: Seconds after which an unused model is unloaded. Never if not provided.
+        @param sessions: Inference sessions per pipeline, used to estimate footprint.
+        @param on_evict: Callback receiving the id of each unloaded model, to drop other references to its pipeline.
+        @param estimator: Callback estimating resident bytes of a loaded model. Defaults to `estimate_footprint`.
+        """
+        self.factory = factory
+        self.max_models = max_models
+        self.max_memory = max_memory
+        self.idle_timeout = idle_timeout
+        self.sessions = sessions
+        self.on_evict = on_evict
+        self.estimator = estimator
+        self.__entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__model_locks: dict[str, threading.Lock] = {}
+        self.__loading: set[str] = set()
+        """Models being loaded"""
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self.__entries
+
+    def get(self, model_id: str, pin: bool = False) -> ReRankPipeline:
+        """
+        Get resident pipeline of model, loading it if needed. Concurrent callers of
+        the same model wait for a single load.
+        @param model_id: Model ID
+        @param pin: Keep model resident regardless of eviction policy.
+        """
+        with self.__lock:
+            entry = self.__touch(model_id, pin)
+            if entry is not None:
+                return entry.pipeline
+            model_lock = self.__model_locks.setdefault(model_id, threading.Lock())
+
+        with model_lock:
+            with self.__lock:
+                entry = self.__touch(model_id, pin)
+                if entry is not None:
+                    return entry.pipeline
+
+            with self.__lock:
+                self.__loading.add(model_id)
+            try:
+                pipeline = self.factory(model_id)
+                # Files are only measured once loaded, so a failed load fetches nothing more.
+                footprint = self.__estimate(model_id)
+            finally:
+                with self.__lock:
+                    self.__loading.discard(model_id)
+            # Resident models are only evicted once the new one loaded, a failed load keeps them warm.
+            with self.__lock:
+                evicted = self.__evict(reserve=footprint)
+                self.__entries[model_id] = _Entry(pipeline, footprint, pinned=pin)
+            self.__notify(evicted)
+            return pipeline
+
+    def evict_idle(self) -> list[str]:
+        """Unload models unused for `idle_timeout` seconds and return their ids."""
+        if self.idle_timeout is None:
+            return []
+        deadline = monotonic() - self.idle_timeout
+        with self.__lock:
+            idle = [
+                model_id for model_id, entry in self.__entries.items()
+                if not entry.pinned and entry.last_used < deadline
+            ]
+            for model_id in idle:
+                del self.__entries[model_id]
+        self.__notify(idle)
+        return idle
+
+    def resident(self) -> list[dict[str, str | int | float | bool]]:
+        """Describe resident models, least recently used first."""
+        now = monotonic()
+        with self.__lock:
+            return [
+                {
+                    "model": model_id,
+                    "footprint_bytes": entry.footprint,
+                    "loaded_seconds": now - entry.loaded_at,
+                    "idle_seconds": now - entry.last_used,
+                    "pinned": entry.pinned
+                }
+                for model_id, entry in self.__entries.items()
+            ]
+
+    def memory(self) -> int:
+        """Estimated bytes of resident models."""
+        with self.__lock:
+            return sum(entry.footprint for entry in self.__entries.values())
+
+    def __estimate(self, model_id: str) -> int:
+        """Estimated resident bytes of a loaded model."""
+        if self.estimator is not None:
+            return self.estimator(model_id)
+        return estimate_footprint(model_id, self.sessions)
+
+    def __touch(self, model_id: str, pin: bool) -> Optional[_Entry]:
+        """Mark model as most recently used."""
+        entry = self.__entries.get(model_id)
+        if entry is not None:
+            entry.last_used = monotonic()
+            entry.pinned = entry.pinned or pin
+            self.__entries.move_to_end(model_id)
+        return entry
+
+    def __evict(self, reserve: int) -> list[str]:
+        """
+        Evict least recently used unpinned models until a model of `reserve` bytes fits 
+        next to resident models and the slots of models still loading. Returns evicted ids.
+        """
+        def over_budget() -> bool:
+            if self.max_models is not None and len(self.__entries) + len(self.__loading) + 1 > self.max_models:
+                return True
+            used = sum(entry.footprint for entry in self.__entries.values())
+            return self.max_memory is not None and used + reserve > self.max_memory
+
+        evicted = []
+        for model_id in [model_id for model_id, entry in self.__entries.items() if not entry.pinned]:
+            if not over_budget():
+                break
+            del self.__entries[model_id]
+            evicted.append(model_id)
+        return evicted
+
+    def __notify(self, evicted: list[str]) -> None:
+        """Report unloaded models to `on_evict`."""
+        if self.on_evict is not None:
+            for model_id in evicted:
+                self.on_evict(model_id)
@@ -1,17 +1,35 @@
 import sys
-from typing import TypeAlias, Any
+from functools import lru_cache
+from typing import TypeAlias, Any, Callable, Literal, Optional
 
 
 ObjectCollection: TypeAlias = dict[str, Any] | list[Any]
 ObjectScalar: TypeAlias = bool | float | int | str
 ObjectValue: TypeAlias = ObjectCollection | ObjectScalar    
+InputFormat: TypeAlias = Literal['json', 'jsonl', 'yaml']
 
-def object_parser(obj: ObjectValue, schema: str) -> ObjectValue:
+_KEY, _INDEX, _ITER = range(3)
+
+def _apply_schema(obj: ObjectValue, steps: tuple[tuple[int, Any], ...], schema: str) -> ObjectValue:
+    for idx, (kind, value) in enumerate(steps):
+        if kind == _ITER:
+            if idx + 1 == len(steps):
+                return obj
+            return [_apply_schema(item, steps[idx + 1:], schema) for item in obj][0]
+        try:
+            obj = obj[value]
+        except (KeyError, IndexError):
+            raise ValueError(f'{schema!r} schema not compatible with input data.')
+    return obj
+
+@lru_cache(maxsize=256)
+def compile_schema(schema: str) -> Callable[[ObjectValue], ObjectValue]:
+    """Parse schema once into an accessor callable. Raises ValueError for invalid schema."""
     import re
     from itertools import groupby
 
     if schema == '.':
-        return obj
+        return lambda obj: obj
     
     usable_schema = '.['.join(re.split(r'(?:\[|\.\[)', schema))
     if not re.match(
@@ -19,30 +37,88 @@ def object_parser(obj: ObjectValue, schema: str) -> ObjectValue:
     ):
         raise ValueError(f'{schema!r} is not a valid schema.')
 
-    def __inner__(_in: ObjectValue, keys: list[str]):
-        for idx, key in enumerate(keys):
-            _match = re.search(r'^\[(\d)?\]$', key)
+    steps = []
+    for key, _ in groupby(usable_schema.lstrip('.').split('.')):
+        _match = re.search(r'^\[(\d)?\]$', key)
+        if _match is None:
+            steps.append((_KEY, key))
+        elif _match.group(1) is not None:
+            steps.append((_INDEX, int(_match.group(1))))
+        else:
+            steps.append((_ITER, None))
+    
+    steps = tuple(steps)
+    if all(kind != _ITER for kind, _ in steps):
+        keys = tuple(value for _, value in steps)
+        def accessor(obj: ObjectValue) -> ObjectValue:
             try:
-                if _match is None:
-                    _in = _in[key]
-                    continue
-
-                obj_idx = _match.group(1)
-                if obj_idx is not None:
-                    _in = _in[int(obj_idx)]
-                    continue
+                for key in keys:
+                    obj = obj[key]
             except (KeyError, IndexError):
                 raise ValueError(f'{schema!r} schema not compatible with input data.')
+            return obj
+        return accessor
+    return lambda obj: _apply_schema(obj, steps, schema)
 
-            _keys = keys[idx + 1:]
-            if not _keys:
-                return _in
+def object_parser(obj: ObjectValue, schema: str) -> ObjectValue:
+    return compile_schema(schema)(obj)
+
+def sniff_format(text: str) -> InputFormat:
+    """
+    Guess input format from its first line without parsing it. Input starting with 
+    `{` or `[` is JSON, or JSON lines when its first line is a complete value followed 
+    by another one. Anything else is YAML.
+    """
+    stripped = text.lstrip()
+    if not stripped.startswith(('{', '[')):
+        return 'yaml'
+    first_line, _, rest = stripped.partition('\n')
+    if first_line.rstrip().endswith(('}', ']')) and rest.lstrip().startswith(('{', '[')):
+        return 'jsonl'
+    return 'json'
+
+def _yaml_documents(text: str) -> int:
+    """Count YAML documents from `---` separators at line start."""
+    import re
+    separators = [match.start() for match in re.finditer(r'^---(?=\s|$)', text, flags=re.MULTILINE)]
+    if not separators:
+        return 1
+    head = [
+        line for line in text[:separators[0]].splitlines() 
+        if line.strip() and not line.lstrip().startswith(('#', '%'))
+    ]
+    return len(separators) + (1 if head else 0)
 
-            return [__inner__(item, _keys) for item in _in][0]
-        return _in
-    return __inner__(
-        obj, [k for k, _ in groupby(usable_schema.lstrip('.').split('.'))]
-    )
+def load_input(text: str, fmt: Optional[InputFormat] = None) -> tuple[ObjectValue, bool]:
+    """
+    Parse input in a single pass. Format is sniffed if not provided.
+    YAML is loaded with the LibYAML based loader when available.
+    @param text: Input text.
+    @param fmt: Input format [ json | jsonl | yaml ]
+    @return: Parsed value, and whether it is a list of documents (JSON lines or YAML documents).
+    @raise ValueError: Input is not valid in its format.
+    """
+    from orjson import loads
+    sniffed = fmt is None
+    fmt = fmt or sniff_format(text)
+    if fmt == 'json':
+        try:
+            return loads(text), False
+        except ValueError:
+            if not sniffed:
+                raise
+            fmt = 'jsonl'
+    if fmt == 'jsonl':
+        return [loads(line) for line in text.splitlines() if line.strip()], True
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    try:
+        if _yaml_documents(text) > 1:
+            return list(yaml.load_all(text, Loader=loader)), True
+        return yaml.load(text, Loader=loader), False
+    except yaml.YAMLError as e:
+        raise ValueError(str(e))
 
 def read_stdin(readlines: bool = False):
     """Read values from standard input (stdin). """
@@ -55,6 +131,16 @@ def read_stdin(readlines: bool = False):
     except KeyboardInterrupt:
         return
     
+def iter_stdin():
+    """Iterate over lines of standard input (stdin) without reading it whole."""
+    if sys.stdin.isatty():
+        return
+    try:
+        for line in sys.stdin:
+            yield line.strip('\n')
+    except KeyboardInterrupt:
+        return
+    
 def print_and_exit(msg: str, code: int = 0):
     stream = sys.stdout if not code else sys.stderr
     print(msg, file=stream)
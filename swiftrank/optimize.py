@@ -0,0 +1,199 @@
+"""
+Reduced precision model variants.
+
+Variants are created from the cached model file and saved next to it:
+- `int8`: dynamic int8 quantization of weights, activations are quantized at runtime.
+- `fp16`: weights stored in half precision only, cast back to float32 when the model loads.
+  Operators still compute in float32, so the file shrinks but inference is not faster.
+
+Each variant is saved with a `<variant>.report.json` benchmark report comparing its latency
+and scores with the original model.
+"""
+import os
+import json
+from pathlib import Path
+from time import perf_counter
+from statistics import median
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from . import settings
+
+SAMPLE_QUERIES = (
+    "How do vaccines train the immune system?",
+    "best way to store fresh herbs",
+    "What causes the seasons on Earth?",
+    "python list comprehension with condition",
+    "symptoms of iron deficiency",
+    "Who painted the ceiling of the Sistine Chapel?",
+)
+
+SAMPLE_CONTEXTS = (
+    "Vaccines expose the immune system to a harmless piece or weakened form of a pathogen, "
+    "so it learns to produce antibodies and memory cells without causing the disease.",
+    "Booster doses remind the immune system of an antigen it has seen before, raising antibody levels again.",
+    "Soft herbs like basil and parsley keep best trimmed and standing in a glass of water, loosely covered.",
+    "Hardy herbs such as rosemary and thyme last longer wrapped in a damp paper towel in the refrigerator.",
+    "Earth's axis is tilted about 23.5 degrees, so each hemisphere receives more direct sunlight "
+    "during part of its orbit, which produces summer and winter.",
+    "The distance between the Earth and the Sun changes only slightly during the year and is not the cause of seasons.",
+    "A list comprehension can filter items with a trailing if clause: [x for x in items if x > 0].",
+    "Conditional expressions inside a comprehension choose a value per item: [x if x > 0 else 0 for x in items].",
+    "Iron deficiency often causes fatigue, pale skin, shortness of breath, brittle nails and cold hands.",
+    "Spinach, lentils and red meat are good dietary sources of iron.",
+    "Michelangelo painted the Sistine Chapel ceiling between 1508 and 1512 at the request of Pope Julius II.",
+    "The Last Judgment on the altar wall of the Sistine Chapel was painted decades after the ceiling.",
+    "The stock market closed higher on Friday after a week of volatile trading.",
+    "A good night's sleep improves memory consolidation and concentration.",
+)
+
+FP16_MIN_ELEMENTS = 16
+"""Smaller float tensors (scales, biases of scalars) are kept in float32"""
+
+
+def _require_onnx():
+    try:
+        import onnx
+    except ImportError:
+        raise ImportError("Creating model variants requires onnx, install it with `pip install swiftrank[optimize]`.")
+    return onnx
+
+
+def quantize_int8(source: Path, target: Path) -> None:
+    """
+    Quantize weights of model to int8 with dynamic activation quantization.
+    @param source: Path of float model.
+    @param target: Path of quantized model.
+    """
+    _require_onnx()
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+
+def convert_fp16(source: Path, target: Path) -> None:
+    """
+    Store float weights of model in half precision, each followed by a cast to float32.
+    Only storage is fp16: weights are cast back at load and every operator computes in float32,
+    so the file of float models halves while inference time stays the same.
+    @param source: Path of float model.
+    @param target: Path of converted model.
+    """
+    onnx = _require_onnx()
+    from onnx import TensorProto, helper, numpy_helper
+
+    model = onnx.load(str(source))
+    graph = model.graph
+    graph_inputs = {node.name for node in graph.input}
+    casts = []
+    for initializer in graph.initializer:
+        if initializer.data_type != TensorProto.FLOAT or initializer.name in graph_inputs:
+            continue
+        weights = numpy_helper.to_array(initializer)
+        halved = weights.astype(np.float16)
+        if weights.size < FP16_MIN_ELEMENTS or not np.isfinite(halved).all():
+            continue
+        name = initializer.name
+        initializer.CopyFrom(numpy_helper.from_array(halved, f"{name}.fp16"))
+        casts.append(helper.make_node("Cast", [f"{name}.fp16"], [name], name=f"{name}.cast", to=TensorProto.FLOAT))
+
+    for node in reversed(casts):
+        graph.node.insert(0, node)
+    onnx.checker.check_model(model)
+    onnx.save(model, str(target))
+
+
+CONVERTERS = {"int8": quantize_int8, "fp16": convert_fp16}
+
+
+def benchmark_variant(
+    model_id: str,
+    variant: str,
+    queries: Sequence[str] = SAMPLE_QUERIES,
+    contexts: Sequence[str] = SAMPLE_CONTEXTS,
+    repeat: int = 10
+) -> dict[str, Any]:
+    """
+    Compare latency and scores of a variant with the original model, ranking every context for every query.
+    @param model_id: Model ID
+    @param variant: Variant name.
+    @param queries: Evaluation queries.
+    @param contexts: Evaluation contexts.
+    @param repeat: Timed runs per model after one warm-up run.
+    """
+    from .ranker import Ranker, Tokenizer, ReRankPipeline
+
+    tokenizer = Tokenizer(model_id=model_id)
+    pairs = [(query, context) for query in queries for context in contexts]
+    results = {}
+    for name in (None, variant):
+        pipeline = ReRankPipeline(
+            ranker=Ranker(model_id=model_id, save_optimized=False, variant=name), tokenizer=tokenizer
+        )
+        scores = pipeline.score_pairs(pairs)
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            pipeline.score_pairs(pairs)
+            timings.append(perf_counter() - start)
+        results[name] = (scores.reshape(len(queries), len(contexts)), median(timings) * 1e3)
+
+    (original, original_ms), (scores, variant_ms) = results[None], results[variant]
+    ranks = lambda values: values.argsort(axis=1).argsort(axis=1).astype(np.float64)
+    original_ranks, variant_ranks = ranks(original), ranks(scores)
+    correlations = [
+        np.corrcoef(expected, actual)[0, 1] if expected.std() and actual.std() else 1.0
+        for expected, actual in zip(original_ranks, variant_ranks)
+    ]
+    difference = np.abs(original - scores)
+    original_path = settings.get_model_path(model_id=model_id) / settings.MODEL_MAP[model_id]
+    return {
+        "model": model_id,
+        "variant": variant,
+        "size_bytes": settings.get_variant_path(model_id, variant).stat().st_size,
+        "original_size_bytes": original_path.stat().st_size,
+        "pairs": len(pairs),
+        "latency_ms": {"original": original_ms, "variant": variant_ms},
+        "speedup": original_ms / variant_ms,
+        "agreement": {
+            "max_abs_diff": float(difference.max()),
+            "mean_abs_diff": float(difference.mean()),
+            "top1": float((original.argmax(axis=1) == scores.argmax(axis=1)).mean()),
+            "spearman": float(np.mean(correlations)),
+        },
+    }
+
+
+def load_report(model_id: str, variant: str) -> Optional[dict[str, Any]]:
+    """Benchmark report of a variant, None if the variant or its report was not created."""
+    target = settings.get_variant_path(model_id, variant)
+    report_path = target.with_suffix(".report.json")
+    return json.loads(report_path.read_text()) if target.exists() and report_path.exists() else None
+
+
+def optimize(model_id: str, variant: str, force: bool = False, repeat: int = 10) -> dict[str, Any]:
+    """
+    Create a variant of a cached model and its benchmark report, unless both already exist.
+    @param model_id: Model ID
+    @param variant: Variant name [ int8 | fp16 ]
+    @param force: Recreate existing variant.
+    @param repeat: Timed benchmark runs per model.
+    @return: Benchmark report.
+    """
+    if model_id not in settings.MODEL_MAP:
+        raise LookupError(f"{model_id!r} model not available.")
+    target = settings.get_variant_path(model_id, variant)
+    if not force and (report := load_report(model_id, variant)) is not None:
+        return report
+
+    source = settings.get_model_path(model_id=model_id) / settings.MODEL_MAP[model_id]
+    temp_path = target.with_name(f"{target.stem}.{os.getpid()}.tmp.onnx")
+    try:
+        CONVERTERS[variant](source, temp_path)
+        os.replace(temp_path, target)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    report = benchmark_variant(model_id, variant, repeat=repeat)
+    target.with_suffix(".report.json").write_text(json.dumps(report, indent=2))
+    return report
@@ -1,8 +1,17 @@
+import os
 import json
+import asyncio
+import hashlib
+import threading
+from time import perf_counter
+from queue import SimpleQueue
 from pathlib import Path
+from itertools import chain
 from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 from typing import (
-    overload, cast, Any, Optional, Iterable, Callable, TypeVar
+    overload, cast, Any, Optional, Iterable, Callable, Iterator, Sequence, TypeVar, TypeAlias
 )
 
 import numpy as np
@@ -10,34 +19,223 @@ import onnxruntime as ort
 from tokenizers import AddedToken, Tokenizer as TokenizerLoader
 
 from . import settings
+from .cache import ScoreCache
+from .index import CorpusIndex, tokenizer_fingerprint
 
 
 _T = TypeVar("_T")
 
+StageHook: TypeAlias = Callable[[str, float, dict[str, int]], None]
+"""Pipeline stage callback receiving stage name, elapsed seconds and stage sizes."""
+
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL
+}
+
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    """Logistic function without overflow, exp is only taken of non-positive values."""
+    exp = np.exp(-np.abs(logits))
+    return np.where(logits >= 0, 1, exp) / (1 + exp)
+
+
+def log_odds(output: np.ndarray, relevant_class: int) -> np.ndarray:
+    """
+    Log odds of the relevant class under a softmax over output classes, computed with a 
+    shifted log-sum-exp. Its sigmoid is the softmax probability of the relevant class.
+    """
+    others = np.delete(output, relevant_class, axis=1)
+    peak = others.max(axis=1)
+    return output[:, relevant_class] - peak - np.log(np.exp(others - peak[:, None]).sum(axis=1))
+
+
+ACTIVATIONS: dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "sigmoid": sigmoid,
+    # Sigmoid over log odds: multi-class outputs are first reduced to log odds of the relevant
+    # class by `log_odds`, whose sigmoid is the softmax probability of that class.
+    "softmax": sigmoid,
+    "identity": lambda logits: logits
+}
+"""Activations turning relevance logits into scores. `identity` scores are unbounded logits"""
+
+
+def create_session_options(
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    graph_optimization: Optional[str] = None,
+    execution_mode: Optional[str] = None,
+    enable_mem_arena: Optional[bool] = None
+) -> ort.SessionOptions:
+    """
+    Create onnxruntime session options. Unset values are taken from settings.
+    @param intra_op_threads: Threads used within operators (0 lets onnxruntime decide)
+    @param inter_op_threads: Threads used across operators (0 lets onnxruntime decide)
+    @param graph_optimization: Graph optimization level [ disable | basic | extended | all ]
+    @param execution_mode: Execution mode [ sequential | parallel ]
+    @param enable_mem_arena: Use onnxruntime CPU memory arena
+    """
+    graph_optimization = graph_optimization or settings.GRAPH_OPTIMIZATION_LEVEL
+    if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"{graph_optimization!r} is not a valid graph optimization level.")
+    execution_mode = execution_mode or settings.EXECUTION_MODE
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"{execution_mode!r} is not a valid execution mode.")
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = settings.INTRA_OP_NUM_THREADS if intra_op_threads is None else intra_op_threads
+    options.inter_op_num_threads = settings.INTER_OP_NUM_THREADS if inter_op_threads is None else inter_op_threads
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization]
+    options.execution_mode = EXECUTION_MODES[execution_mode]
+    options.enable_cpu_mem_arena = settings.ENABLE_MEM_ARENA if enable_mem_arena is None else enable_mem_arena
+    return options
+
+
+def _clone_session_options(options: ort.SessionOptions) -> ort.SessionOptions:
+    """Copy settable fields of session options into new ones."""
+    clone = ort.SessionOptions()
+    for name in dir(options):
+        if name.startswith('_') or callable(getattr(options, name)):
+            continue
+        try:
+            setattr(clone, name, getattr(options, name))
+        except AttributeError:
+            pass
+    return clone
+
 
 class Ranker:
     """Load Ranker from available models."""
     def __init__(
-        self, model_id: str = settings.DEFAULT_MODEL
+        self, 
+        model_id: str = settings.DEFAULT_MODEL,
+        session_options: Optional[ort.SessionOptions] = None,
+        providers: Optional[Sequence[str]] = None,
+        save_optimized: Optional[bool] = None,
+        sessions: int = 1,
+        variant: Optional[str] = None
     ) -> None:
+        """
+        @param model_id: Model ID
+        @param session_options: onnxruntime session options, created from settings if not provided.
+        @param providers: onnxruntime execution providers in order of preference.
+        @param save_optimized: Save optimized graph into model directory and load it on later startups. 
+            Graphs are saved per onnxruntime version and execution providers. Sessions are created 
+            from a copy of `session_options` holding its fields, but not its config entries.
+        @param sessions: Number of inference sessions to create. Unless configured, 
+            intra-op threads are split evenly between sessions.
+        @param variant: Reduced precision variant created by `swiftrank optimize` [ int8 | fp16 ]. 
+            The original model is loaded if not provided.
+        """
+        if sessions < 1:
+            raise ValueError("sessions must be a positive integer.")
         self.model_id = model_id
+        self.variant = variant
         model_file = settings.MODEL_MAP.get(self.model_id)
         if model_file is None:
             raise LookupError(f"{self.model_id!r} model not available.")
-        self.instance = ort.InferenceSession(
-            settings.get_model_path(model_id=self.model_id) / model_file
+        
+        model_path = settings.get_model_path(model_id=self.model_id) / model_file
+        if variant is not None:
+            model_path = settings.get_variant_path(self.model_id, variant)
+            if not model_path.exists():
+                raise LookupError(
+                    f"{variant!r} variant of {self.model_id!r} not found, "
+                    f"create it with `swiftrank optimize {self.model_id} --variant {variant}`."
+                )
+        if session_options is None:
+            intra_op_threads = None
+            if sessions > 1 and not settings.INTRA_OP_NUM_THREADS:
+                intra_op_threads = max(1, (os.cpu_count() or 1) // sessions)
+            session_options = create_session_options(intra_op_threads=intra_op_threads)
+        if save_optimized is None:
+            save_optimized = settings.SAVE_OPTIMIZED_MODEL
+        
+        self.instances = [
+            self.__load_session(model_path, session_options, providers, save_optimized) 
+            for _ in range(sessions)
+        ]
+        self.instance = self.instances[0]
+
+    def __load_session(
+        self, 
+        model_path: Path, 
+        options: ort.SessionOptions, 
+        providers: Optional[Sequence[str]], 
+        save_optimized: bool
+    ) -> ort.InferenceSession:
+        """
+        Load inference session, saving or reusing optimized graph if requested. Optimized graphs
+        depend on the hardware, onnxruntime version and execution providers they were built with, 
+        so the latter two are part of their file name.
+        """
+        level = next(
+            name for name, value in GRAPH_OPTIMIZATION_LEVELS.items() if value == options.graph_optimization_level)
+        if not save_optimized or level == "disable":
+            return self.__create_session(model_path, options, providers)
+        
+        providers = list(providers or settings.EXECUTION_PROVIDERS)
+        providers_key = hashlib.sha256(",".join(providers).encode("utf-8")).hexdigest()[:12]
+        optimized_path = model_path.with_suffix(f".{level}.ort-{ort.__version__}.{providers_key}.onnx")
+        options = _clone_session_options(options)
+        if optimized_path.exists():
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS["disable"]
+            return self.__create_session(optimized_path, options, providers)
+        
+        temp_path = optimized_path.with_name(f"{optimized_path.stem}.{os.getpid()}.tmp.onnx")
+        options.optimized_model_filepath = str(temp_path)
+        session = self.__create_session(model_path, options, providers)
+        os.replace(temp_path, optimized_path)
+        return session
+
+    def __create_session(
+        self, path: Path, options: ort.SessionOptions, providers: Optional[Sequence[str]]
+    ) -> ort.InferenceSession:
+        """Create inference session"""
+        return ort.InferenceSession(
+            path, sess_options=options, providers=list(providers or settings.EXECUTION_PROVIDERS)
         )
 
 
 class Tokenizer:
     """Load Tokenizer from available models."""
+    CONFIG_FILES = ("config.json", "tokenizer_config.json", "special_tokens_map.json", "tokenizer.json")
+    """Files the configured tokenizer is built from."""
+
     def __init__(
-        self, model_id: str = settings.DEFAULT_MODEL, max_length: int = 512
+        self, model_id: str = settings.DEFAULT_MODEL, max_length: int = 512, load_vocab: bool = False
     ) -> None:
+        """
+        @param model_id: Model ID
+        @param max_length: Max length for tokenizer
+        @param load_vocab: Attach `vocab` and `ids_to_tokens` of vocab file to the tokenizer instance.
+            They are not used for reranking and are otherwise loaded on first access.
+        """
         self.model_id = model_id
         self.model_dir = settings.get_model_path(model_id=self.model_id) 
         self.max_length = max_length
+        self.__vocab: Optional[tuple[OrderedDict[str, int], OrderedDict[int, str]]] = None
         self.instance = self.__load()
+        if load_vocab:
+            self.instance.vocab, self.instance.ids_to_tokens = self.vocab, self.ids_to_tokens
+
+    @property
+    def vocab(self) -> OrderedDict[str, int]:
+        """Token to id mapping of vocab file."""
+        return self.__get_vocab()[0]
+
+    @property
+    def ids_to_tokens(self) -> OrderedDict[int, str]:
+        """Id to token mapping of vocab file."""
+        return self.__get_vocab()[1]
     
     def __file_handler(self, filename: str, read_json: bool = True) -> dict[str, Any] | Path:
         """Json file handler. If read_json is true, returns loaded object else path is returned"""
@@ -48,6 +246,12 @@ class Tokenizer:
             return json.loads(path.read_bytes())
         return path
 
+    def __get_vocab(self) -> tuple[OrderedDict[str, int], OrderedDict[int, str]]:
+        """Load vocab file on first access"""
+        if self.__vocab is None:
+            self.__vocab = self.__load_vocab(cast(Path, self.__file_handler("vocab.txt", read_json=False)))
+        return self.__vocab
+
     def __load_vocab(self, vocab_file: Path):
         """Load vocab file"""
         vocab, ids_to_tokens = OrderedDict(), OrderedDict() 
@@ -61,7 +265,18 @@ class Tokenizer:
         return vocab, ids_to_tokens
 
     def __load(self):
-        """Load tokenizer"""
+        """
+        Load tokenizer. The configured tokenizer is saved into model directory and 
+        loaded from there while it is newer than the files it was built from.
+        """
+        configured_file = self.model_dir / f"tokenizer.configured-{self.max_length}.json"
+        try:
+            built_at = configured_file.stat().st_mtime
+            if all(self.model_dir.joinpath(name).stat().st_mtime <= built_at for name in self.CONFIG_FILES):
+                return cast(TokenizerLoader, TokenizerLoader.from_file(str(configured_file)))
+        except OSError:
+            pass
+
         config = self.__file_handler("config.json")
         tokenizer_config = self.__file_handler("tokenizer_config.json")
         tokens_map = self.__file_handler("special_tokens_map.json")
@@ -77,76 +292,298 @@ class Tokenizer:
                 tokenizer.add_special_tokens([token])
             elif isinstance(token, dict):
                 tokenizer.add_special_tokens([AddedToken(**token)])
-        
-        vocab_file = self.model_dir / "vocab.txt"
-        if vocab_file.exists():
-            tokenizer.vocab, tokenizer.ids_to_tokens = self.__load_vocab(vocab_file)
 
+        temp_file = configured_file.with_name(f"{configured_file.stem}.{os.getpid()}.tmp")
+        try:
+            tokenizer.save(str(temp_file), pretty=False)
+            os.replace(temp_file, configured_file)
+        except Exception:
+            temp_file.unlink(missing_ok=True)
         return tokenizer
-    
-    
-class ReRankPipeline:
+
+
+class _PairTemplate:
     """
-    Pipeline for reranking task.
+    Special tokens and truncation of a tokenizer's pair layout `prefix A middle B suffix`,
+    used to assemble pairs from separately tokenized queries and contexts.
+    """
+    def __init__(self, encoding, truncation: Optional[dict[str, Any]]) -> None:
+        """
+        @param encoding: Encoding of a (query, context) pair with special tokens.
+        @param truncation: Truncation parameters of the tokenizer.
+        """
+        sequence_ids = encoding.sequence_ids
+        first = [idx for idx, seq in enumerate(sequence_ids) if seq == 0]
+        second = [idx for idx, seq in enumerate(sequence_ids) if seq == 1]
+        if not first or not second or first[-1] > second[0] or \
+            len(first) != first[-1] - first[0] + 1 or len(second) != second[-1] - second[0] + 1:
+            raise ValueError("Unsupported pair template.")
+        if truncation is not None and (
+            truncation['strategy'] != 'longest_first' or truncation['direction'] not in ('left', 'right')):
+            raise ValueError("Unsupported truncation.")
 
-    Example:
-    ```python
-    from swiftrank import ReRankPipeline
-    pipeline = ReRankPipeline(ranker=ranker, tokenizer=tokenizer)
-    pipeline.invoke(
-        query="<query>", contexts=["<context1>", "<context2>", ...]    
-    )
-    ```
+        ids, type_ids = np.array(encoding.ids, dtype=np.int64), np.array(encoding.type_ids, dtype=np.int64)
+        segments = [slice(0, first[0]), slice(first[-1] + 1, second[0]), slice(second[-1] + 1, None)]
+        self.prefix_ids, self.middle_ids, self.suffix_ids = (ids[segment] for segment in segments)
+        self.prefix_type_ids, self.middle_type_ids, self.suffix_type_ids = (type_ids[segment] for segment in segments)
+        self.first_type_id, self.second_type_id = int(type_ids[first[0]]), int(type_ids[second[0]])
+        self.added_tokens = len(ids) - len(first) - len(second)
+        self.max_length = None if truncation is None else truncation['max_length'] - self.added_tokens
+        self.truncate_left = truncation is not None and truncation['direction'] == 'left'
+
+    def truncate(self, first: np.ndarray, second: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Truncated lengths of pair sequences, following the `longest_first` strategy of tokenizers."""
+        if self.max_length is None:
+            return first, second
+        budget = self.max_length
+        swap = first > second
+        short, long = np.where(swap, second, first), np.where(swap, first, second)
+        halve = 2 * short > budget
+        short_length = np.minimum(short, np.where(halve, budget // 2, short))
+        long_length = np.minimum(long, np.where(halve, budget - budget // 2, budget - short))
+        overflow = first + second > budget
+        return (
+            np.where(overflow, np.where(swap, long_length, short_length), first),
+            np.where(overflow, np.where(swap, short_length, long_length), second)
+        )
+
+
+class _PairEncodings:
+    """Pairs encoded together by the tokenizer."""
+    def __init__(self, encodings: list, pad_id: int, pad_type_id: int) -> None:
+        self.encodings = encodings
+        self.lengths = np.fromiter(map(len, encodings), dtype=np.int64, count=len(encodings))
+        self.pad_id, self.pad_type_id = pad_id, pad_type_id
+
+    def fill(
+        self,
+        rows: np.ndarray,
+        input_ids: np.ndarray,
+        attention_mask: np.ndarray,
+        token_type_ids: Optional[np.ndarray] = None
+    ) -> None:
+        """Write padded input ids, attention mask and, if given, token type ids of rows in a single pass."""
+        input_ids.fill(self.pad_id)
+        attention_mask.fill(0)
+        if token_type_ids is not None:
+            token_type_ids.fill(self.pad_type_id)
+        for row, idx in enumerate(rows.tolist()):
+            encoding = self.encodings[idx]
+            input_ids[row, :len(encoding)] = encoding.ids
+            attention_mask[row, :len(encoding)] = 1
+            if token_type_ids is not None:
+                token_type_ids[row, :len(encoding)] = encoding.type_ids
+
+
+class _QueryContextPairs:
+    """
+    Pairs assembled from separately tokenized queries and contexts,
+    so each distinct query is tokenized only once.
     """
     def __init__(
-        self, 
-        ranker: Optional[Ranker] = None, 
-        tokenizer: Optional[Tokenizer] = None
+        self,
+        template: _PairTemplate,
+        query_ids: list[np.ndarray],
+        pair_query: np.ndarray,
+        context_ids: np.ndarray,
+        context_starts: np.ndarray,
+        context_lengths: np.ndarray,
+        pad_id: int,
+        pad_type_id: int
     ) -> None:
         """
-        Initialize a rerank pipeline
-        @param ranker: `Ranker` class instance
-        @param tokenizer: `Tokenizer` class instance
+        @param template: Pair template of the tokenizer.
+        @param query_ids: Token ids of each distinct query, without special tokens.
+        @param pair_query: Query index of each pair.
+        @param context_ids: Token ids of contexts, without special tokens, concatenated.
+        @param context_starts: Start of each pair's context in `context_ids`.
+        @param context_lengths: Untruncated token length of each pair's context.
         """
-        self.ranker = (ranker or Ranker()).instance
-        self.tokenizer = (tokenizer or Tokenizer()).instance
+        self.query_ids, self.pair_query, self.context_ids = query_ids, pair_query, context_ids
+        query_lengths = np.array(list(map(len, query_ids)), dtype=np.int64)[pair_query]
+        self.query_lengths, self.context_lengths = template.truncate(query_lengths, context_lengths)
+        self.query_starts = np.zeros(len(pair_query), dtype=np.int64)
+        self.context_starts = np.array(context_starts, dtype=np.int64)
+        if template.truncate_left:
+            self.query_starts += query_lengths - self.query_lengths
+            self.context_starts += context_lengths - self.context_lengths
+
+        self.template = template
+        self.lengths = template.added_tokens + self.query_lengths + self.context_lengths
+        self.pad_id, self.pad_type_id = pad_id, pad_type_id
 
     @classmethod
-    def from_model_id(cls, __id: str, tk_max_length: int = 512):
-        """
-        Create Reranker from model ID
-        @param __id: Model ID
-        @param tk_max_length: Max length for tokenizer
-        """
+    def encode(
+        cls,
+        template: _PairTemplate,
+        encoder: TokenizerLoader,
+        pairs: Sequence[tuple[str, str]],
+        pad_id: int,
+        pad_type_id: int
+    ) -> "_QueryContextPairs":
+        """Tokenize each distinct query once and every context, without special tokens or truncation."""
+        queries: dict[str, int] = {}
+        pair_query = np.fromiter(
+            (queries.setdefault(query, len(queries)) for query, _ in pairs), dtype=np.intp, count=len(pairs))
+        query_ids = [
+            np.array(encoding.ids, dtype=np.int64)
+            for encoding in encoder.encode_batch(list(queries), add_special_tokens=False)
+        ]
+        contexts = encoder.encode_batch([context for _, context in pairs], add_special_tokens=False)
+        context_lengths = np.fromiter(map(len, contexts), dtype=np.int64, count=len(contexts))
+        context_ids = np.fromiter(
+            chain.from_iterable(encoding.ids for encoding in contexts),
+            dtype=np.int64, count=int(context_lengths.sum()))
         return cls(
-            ranker=Ranker(model_id=__id), 
-            tokenizer=Tokenizer(model_id=__id, max_length=tk_max_length)
+            template, query_ids, pair_query, context_ids, np.cumsum(context_lengths) - context_lengths,
+            context_lengths, pad_id, pad_type_id
         )
 
-    def __create_attr_array(self, tokenized, attr: str):
-        """Create array of tokenized attribute values."""
-        return np.array([getattr(_, attr) for _ in tokenized], dtype=np.int64)
+    def fill(
+        self,
+        rows: np.ndarray,
+        input_ids: np.ndarray,
+        attention_mask: np.ndarray,
+        token_type_ids: Optional[np.ndarray] = None
+    ) -> None:
+        """Write padded input ids, attention mask and, if given, token type ids of rows in a single pass."""
+        template = self.template
+        input_ids.fill(self.pad_id)
+        attention_mask.fill(0)
+        if token_type_ids is not None:
+            token_type_ids.fill(self.pad_type_id)
+
+        prefix_end = len(template.prefix_ids)
+        for row, query, query_start, query_length, context_start, context_length in zip(
+            range(len(rows)), self.pair_query[rows].tolist(),
+            self.query_starts[rows].tolist(), self.query_lengths[rows].tolist(),
+            self.context_starts[rows].tolist(), self.context_lengths[rows].tolist()
+        ):
+            query_end = prefix_end + query_length
+            middle_end = query_end + len(template.middle_ids)
+            context_end = middle_end + context_length
+            suffix_end = context_end + len(template.suffix_ids)
+
+            ids = input_ids[row]
+            ids[:prefix_end] = template.prefix_ids
+            ids[prefix_end:query_end] = self.query_ids[query][query_start:query_start + query_length]
+            ids[query_end:middle_end] = template.middle_ids
+            ids[middle_end:context_end] = self.context_ids[context_start:context_start + context_length]
+            ids[context_end:suffix_end] = template.suffix_ids
+            attention_mask[row, :suffix_end] = 1
+            if token_type_ids is not None:
+                type_ids = token_type_ids[row]
+                type_ids[:prefix_end] = template.prefix_type_ids
+                type_ids[prefix_end:query_end] = template.first_type_id
+                type_ids[query_end:middle_end] = template.middle_type_ids
+                type_ids[middle_end:context_end] = template.second_type_id
+                type_ids[context_end:suffix_end] = template.suffix_type_ids
+
+
+class _InputBuffers:
+    """
+    Reusable int64 input arrays of a ranker session. All inputs are contiguous views 
+    of one flat buffer, which only grows when a larger batch is requested.
+    """
+    def __init__(self, names: Sequence[str]) -> None:
+        self.names = tuple(names)
+        self.__buffer = np.empty(0, dtype=np.int64)
+
+    def get(self, batch_size: int, length: int) -> dict[str, np.ndarray]:
+        """Get input arrays of shape (batch_size, length) by input name."""
+        size = len(self.names) * batch_size * length
+        if size > len(self.__buffer):
+            self.__buffer = np.empty(size, dtype=np.int64)
+        return dict(zip(self.names, self.__buffer[:size].reshape(len(self.names), batch_size, length)))
+
+
+class BaseReRankPipeline:
+    """
+    Reranking methods shared by pipelines, built on their scoring. Subclasses implement
+    `score_pairs`, `ascore_pairs`, `score_index` and `rank`.
+    """
+    def score_pairs(self, pairs: Sequence[tuple[str, str]], raw: bool = False) -> np.ndarray:
+        """
+        Compute relevance scores of (query, context) pairs in input order.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits, before calibration and activation.
+        """
+        raise NotImplementedError
+
+    async def ascore_pairs(self, pairs: Sequence[tuple[str, str]], raw: bool = False) -> np.ndarray:
+        """
+        Awaitable `score_pairs`, scoring off the event loop.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits, before calibration and activation.
+        """
+        raise NotImplementedError
+
+    def score_index(
+        self, query: str, index: CorpusIndex, doc_ids: Optional[Iterable[int]] = None, raw: bool = False
+    ) -> np.ndarray:
+        """
+        Compute relevance scores of indexed documents for query.
+        @param query: The query to use for reranking evaluation.
+        @param index: `CorpusIndex` built with the tokenizer of the pipeline.
+        @param doc_ids: Ids of documents to score, in order. Defaults to every document.
+        @param raw: Return relevance logits, before calibration and activation.
+        """
+        raise NotImplementedError
+
+    def rank(
+        self, contexts: Sequence[_T], scores: np.ndarray, threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[tuple[float, _T]]:
+        """
+        Order contexts by precomputed relevance scores.
+        @param contexts: The contexts object.
+        @param scores: Relevance scores of contexts.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        """
+        raise NotImplementedError
+
+    def _score_queries(self, pairs: Sequence[tuple[str, str]], sizes: Sequence[int]) -> np.ndarray:
+        """Score pairs of several queries concatenated in order, sizes being the number of pairs of each one."""
+        return self.score_pairs(pairs)
+
+    def rank_many(
+        self, contexts_per_query: Sequence[Sequence[_T]], scores: np.ndarray, threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[list[tuple[float, _T]]]:
+        """
+        Order contexts of each query by precomputed relevance scores of all queries concatenated in order.
+        @param contexts_per_query: The contexts objects, one sequence per query.
+        @param scores: Relevance scores of all contexts.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts of each query.
+        """
+        offsets = np.cumsum([len(contexts) for contexts in contexts_per_query])[:-1]
+        return [
+            self.rank(contexts, group_scores, threshold=threshold, top_k=top_k)
+            for contexts, group_scores in zip(contexts_per_query, np.split(scores, offsets))
+        ]
 
     @overload
     def invoke_with_score(
-        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None
+        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None, top_k: Optional[int] = None
     ) -> list[tuple[float, str]]:
         """
         Rerank contexts based on query.
         @param query: The query to use for reranking evaluation.
         @param contexts: The contexts to rerank.
         @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
         """
     
     @overload
     def invoke_with_score(
-        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, *, key: Callable[[_T], str]
+        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
     ) -> list[tuple[float, _T]]:
         """
         Rerank contexts based on query.
         @param query: The query to use for reranking evaluation.
         @param contexts: The contexts object.
         @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
         @param key: callback to use for getting fields from contexts object.
         """
 
@@ -155,51 +592,41 @@ class ReRankPipeline:
         query: str, 
         contexts: Iterable, 
         threshold: Optional[float] = None, 
+        top_k: Optional[int] = None,
         *, 
         key: Callable = None
     ) -> list[tuple]:
 
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+        
+        contexts = contexts if isinstance(contexts, list) else list(contexts)
         processor = (lambda _:_) if key is None else key
-        tokenized = self.tokenizer.encode_batch(
-            [(query, processor(context)) for context in contexts])
-
-        onnx_input = {
-            "input_ids": self.__create_attr_array(tokenized, 'ids'),
-            "attention_mask": self.__create_attr_array(tokenized, 'attention_mask')}
-        token_type_ids = self.__create_attr_array(tokenized, 'type_ids')
-        use_type_ids = not np.all(token_type_ids == 0)
-        if use_type_ids:
-            onnx_input = onnx_input | {'token_type_ids': token_type_ids}
-
-        output = self.ranker.run(None, onnx_input)[0]
-        scores = list(1 / (1 + np.exp(
-            -(output[:, 1] if output.shape[1] > 1 else output.flatten()))))
-        combined = sorted(zip(scores, contexts), key=lambda x: x[0], reverse=True)
-
-        if threshold is None:
-            return [(float(sc), ctx) for sc, ctx in combined]
-        return [(float(sc), ctx) for sc, ctx in combined if sc >= threshold]
+        scores = self.score_pairs([(query, processor(context)) for context in contexts])
+        return self.rank(contexts, scores, threshold=threshold, top_k=top_k)
 
     @overload
     def invoke(
-        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None
+        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None, top_k: Optional[int] = None
     ) -> list[str]:
         """
         Rerank contexts based on query.
         @param query: The query to use for reranking evaluation.
         @param contexts: The contexts to rerank.
         @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
         """
     
     @overload
     def invoke(
-        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, *, key: Callable[[_T], str]
+        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
     ) -> list[_T]:
         """
         Rerank contexts based on query.
         @param query: The query to use for reranking evaluation.
         @param contexts: The contexts object.
         @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
         @param key: callback to use for getting fields from contexts object.
         """
 
@@ -208,9 +635,578 @@ class ReRankPipeline:
         query: str, 
         contexts: Iterable, 
         threshold: Optional[float] = None, 
+        top_k: Optional[int] = None,
         *, 
         key: Callable = None
     ) -> list:
 
         return [context for _, context in self.invoke_with_score(
-            query=query, contexts=contexts, threshold=threshold, key=key)]
\ No newline at end of file
+            query=query, contexts=contexts, threshold=threshold, top_k=top_k, key=key)]
+
+    @overload
+    def invoke_many_with_score(
+        self, queries: Iterable[str], contexts_per_query: Iterable[Iterable[str]], threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[list[tuple[float, str]]]:
+        """
+        Rerank contexts of several queries, scoring pairs of all queries in shared inference batches.
+        @param queries: The queries to use for reranking evaluation.
+        @param contexts_per_query: The contexts to rerank, one collection per query.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts of each query.
+        """
+
+    @overload
+    def invoke_many_with_score(
+        self, queries: Iterable[str], contexts_per_query: Iterable[Iterable[_T]], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
+    ) -> list[list[tuple[float, _T]]]:
+        """
+        Rerank contexts of several queries, scoring pairs of all queries in shared inference batches.
+        @param queries: The queries to use for reranking evaluation.
+        @param contexts_per_query: The contexts objects, one collection per query.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts of each query.
+        @param key: callback to use for getting fields from contexts object.
+        """
+
+    def invoke_many_with_score(
+        self,
+        queries: Iterable[str],
+        contexts_per_query: Iterable[Iterable],
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        *,
+        key: Callable = None
+    ) -> list[list[tuple]]:
+
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+
+        queries = queries if isinstance(queries, list) else list(queries)
+        groups = [contexts if isinstance(contexts, list) else list(contexts) for contexts in contexts_per_query]
+        if len(queries) != len(groups):
+            raise ValueError("queries and contexts_per_query must have the same length.")
+
+        processor = (lambda _:_) if key is None else key
+        scores = self._score_queries([
+            (query, processor(context)) for query, contexts in zip(queries, groups) for context in contexts
+        ], [len(contexts) for contexts in groups])
+        return self.rank_many(groups, scores, threshold=threshold, top_k=top_k)
+
+    @overload
+    def invoke_many(
+        self, queries: Iterable[str], contexts_per_query: Iterable[Iterable[str]], threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[list[str]]:
+        """
+        Rerank contexts of several queries, scoring pairs of all queries in shared inference batches.
+        @param queries: The queries to use for reranking evaluation.
+        @param contexts_per_query: The contexts to rerank, one collection per query.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts of each query.
+        """
+
+    @overload
+    def invoke_many(
+        self, queries: Iterable[str], contexts_per_query: Iterable[Iterable[_T]], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
+    ) -> list[list[_T]]:
+        """
+        Rerank contexts of several queries, scoring pairs of all queries in shared inference batches.
+        @param queries: The queries to use for reranking evaluation.
+        @param contexts_per_query: The contexts objects, one collection per query.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts of each query.
+        @param key: callback to use for getting fields from contexts object.
+        """
+
+    def invoke_many(
+        self,
+        queries: Iterable[str],
+        contexts_per_query: Iterable[Iterable],
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        *,
+        key: Callable = None
+    ) -> list[list]:
+
+        return [[context for _, context in reranked] for reranked in self.invoke_many_with_score(
+            queries=queries, contexts_per_query=contexts_per_query, threshold=threshold, top_k=top_k, key=key)]
+
+    def invoke_index(
+        self,
+        query: str,
+        index: CorpusIndex,
+        doc_ids: Optional[Iterable[int]] = None,
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None
+    ) -> list[tuple[float, int]]:
+        """
+        Rerank indexed documents based on query.
+        @param query: The query to use for reranking evaluation.
+        @param index: `CorpusIndex` built with the tokenizer of the pipeline.
+        @param doc_ids: Ids of candidate documents. Defaults to every document.
+        @param threshold: Get documents that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant documents.
+        @return: (score, document id) pairs.
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+
+        ids = list(range(len(index))) if doc_ids is None else list(doc_ids)
+        return self.rank(ids, self.score_index(query, index, ids), threshold=threshold, top_k=top_k)
+
+    @overload
+    async def ainvoke_with_score(
+        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[tuple[float, str]]:
+        """
+        Rerank contexts based on query without blocking the event loop.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts to rerank.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        """
+    
+    @overload
+    async def ainvoke_with_score(
+        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
+    ) -> list[tuple[float, _T]]:
+        """
+        Rerank contexts based on query without blocking the event loop.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts object.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        @param key: callback to use for getting fields from contexts object.
+        """
+
+    async def ainvoke_with_score(
+        self, 
+        query: str, 
+        contexts: Iterable, 
+        threshold: Optional[float] = None, 
+        top_k: Optional[int] = None,
+        *, 
+        key: Callable = None
+    ) -> list[tuple]:
+
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+        
+        contexts = contexts if isinstance(contexts, list) else list(contexts)
+        processor = (lambda _:_) if key is None else key
+        scores = await self.ascore_pairs([(query, processor(context)) for context in contexts])
+        return self.rank(contexts, scores, threshold=threshold, top_k=top_k)
+
+    @overload
+    async def ainvoke(
+        self, query: str, contexts: Iterable[str], threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[str]:
+        """
+        Rerank contexts based on query without blocking the event loop.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts to rerank.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        """
+    
+    @overload
+    async def ainvoke(
+        self, query: str, contexts: Iterable[_T], threshold: Optional[float] = None, top_k: Optional[int] = None, *, key: Callable[[_T], str]
+    ) -> list[_T]:
+        """
+        Rerank contexts based on query without blocking the event loop.
+        @param query: The query to use for reranking evaluation.
+        @param contexts: The contexts object.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        @param key: callback to use for getting fields from contexts object.
+        """
+
+    async def ainvoke(
+        self, 
+        query: str, 
+        contexts: Iterable, 
+        threshold: Optional[float] = None, 
+        top_k: Optional[int] = None,
+        *, 
+        key: Callable = None
+    ) -> list:
+
+        return [context for _, context in await self.ainvoke_with_score(
+            query=query, contexts=contexts, threshold=threshold, top_k=top_k, key=key)]
+
+
+class ReRankPipeline(BaseReRankPipeline):
+    """
+    Pipeline for reranking task.
+
+    Example:
+    ```python
+    from swiftrank import ReRankPipeline
+    pipeline = ReRankPipeline(ranker=ranker, tokenizer=tokenizer)
+    pipeline.invoke(
+        query="<query>", contexts=["<context1>", "<context2>", ...]    
+    )
+    ```
+    """
+    def __init__(
+        self, 
+        ranker: Optional[Ranker] = None, 
+        tokenizer: Optional[Tokenizer] = None,
+        batch_size: Optional[int] = None,
+        cache: Optional[ScoreCache] = None,
+        max_concurrency: Optional[int] = None
+    ) -> None:
+        """
+        Initialize a rerank pipeline
+        @param ranker: `Ranker` class instance. When it holds several sessions, 
+            buckets are scored concurrently, one session per worker thread.
+        @param tokenizer: `Tokenizer` class instance
+        @param batch_size: Max number of pairs per inference call. Pairs are bucketed by token length.
+        @param cache: `ScoreCache` class instance. Only cache misses are sent to the ranker.
+        @param max_concurrency: Max number of async calls scoring at once. Defaults to twice the
+            number of ranker sessions, so tokenization of one call overlaps inference of another.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be a positive integer.")
+        ranker, tokenizer = ranker or Ranker(), tokenizer or Tokenizer()
+        self.model_id = ranker.model_id
+        self.variant = ranker.variant
+        self.max_length = tokenizer.max_length
+        self.ranker = ranker.instance
+        self.tokenizer = tokenizer.instance
+        self.batch_size = batch_size
+        self.cache = cache
+        self.workers = len(ranker.instances)
+        self.hooks: list[StageHook] = []
+
+        # Token type ids are only fed to models declaring them as graph input.
+        graph_inputs = {node.name for node in self.ranker.get_inputs()}
+        self.__input_names = ("input_ids", "attention_mask") + (
+            ("token_type_ids",) if "token_type_ids" in graph_inputs else ())
+        self.__sessions: SimpleQueue[tuple[ort.InferenceSession, _InputBuffers]] = SimpleQueue()
+        for session in ranker.instances:
+            self.__sessions.put((session, _InputBuffers(self.__input_names)))
+        self.activation = settings.MODEL_ACTIVATIONS.get(self.model_id, "sigmoid")
+        if not callable(self.activation) and self.activation not in ACTIVATIONS:
+            raise ValueError(f"{self.activation!r} activation not available, choose from {', '.join(ACTIVATIONS)}.")
+        self.relevant_class = settings.MODEL_RELEVANT_CLASS.get(self.model_id, 1)
+        self.calibration = settings.MODEL_CALIBRATION.get(self.model_id, (1.0, 0.0))
+        # Variants score differently and logits of multi-class outputs depend on how they are reduced,
+        # so each gets its own cache entries.
+        self.__cache_model = self.model_id if self.variant is None else f"{self.model_id}.{self.variant}"
+        if self.activation == "softmax":
+            self.__cache_model += ".softmax"
+        if self.relevant_class != 1:
+            self.__cache_model += f".class{self.relevant_class}"
+
+        self.__executor = None
+        if self.workers > 1:
+            self.__executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="swiftrank")
+        self.max_concurrency = max_concurrency or 2 * self.workers
+        self.__async_executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="swiftrank-async")
+        self.__async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__semaphore: Optional[asyncio.Semaphore] = None
+
+        padding = self.tokenizer.padding or {}
+        self.__pad_id = padding.get('pad_id', 0)
+        self.__pad_type_id = padding.get('pad_type_id', 0)
+        # Buckets are padded separately, so encode through an unpadded copy.
+        self.__encoder = cast(TokenizerLoader, TokenizerLoader.from_str(self.tokenizer.to_str()))
+        self.__encoder.no_padding()
+        # Queries and contexts are tokenized apart and truncated when assembled into pairs.
+        self.__part_encoder = cast(TokenizerLoader, TokenizerLoader.from_str(self.__encoder.to_str()))
+        self.__part_encoder.no_truncation()
+        self.__template = self.__load_pair_template()
+        self.__fingerprint: Optional[str] = None
+
+    @classmethod
+    def from_model_id(
+        cls, 
+        __id: str, 
+        tk_max_length: int = 512, 
+        batch_size: Optional[int] = None,
+        session_options: Optional[ort.SessionOptions] = None,
+        providers: Optional[Sequence[str]] = None,
+        cache: Optional[ScoreCache] = None,
+        workers: int = 1,
+        max_concurrency: Optional[int] = None,
+        variant: Optional[str] = None
+    ):
+        """
+        Create Reranker from model ID
+        @param __id: Model ID
+        @param tk_max_length: Max length for tokenizer
+        @param batch_size: Max number of pairs per inference call
+        @param session_options: onnxruntime session options for ranker
+        @param providers: onnxruntime execution providers for ranker
+        @param cache: `ScoreCache` class instance
+        @param workers: Number of inference sessions scoring shards concurrently
+        @param max_concurrency: Max number of async calls scoring at once
+        @param variant: Reduced precision model variant [ int8 | fp16 ]
+        """
+        return cls(
+            ranker=Ranker(
+                model_id=__id, session_options=session_options, providers=providers, sessions=workers, variant=variant
+            ), 
+            tokenizer=Tokenizer(model_id=__id, max_length=tk_max_length),
+            batch_size=batch_size,
+            cache=cache,
+            max_concurrency=max_concurrency
+        )
+
+    def add_hook(self, hook: StageHook) -> None:
+        """
+        Register a stage timing callback. It is called with the stage name, elapsed seconds and 
+        stage sizes after each `cache`, `tokenize`, `inference` and `rank` stage. 
+        `inference` runs once per bucket and may be reported from worker threads.
+        @param hook: Callback receiving (stage, seconds, sizes).
+        """
+        self.hooks.append(hook)
+
+    def warm_up(self, shapes: Optional[Iterable[tuple[int, int]]] = None) -> None:
+        """
+        Run dummy inference on every ranker session so the first real call does not pay
+        for onnxruntime allocations and kernel setup. Stage hooks are not called.
+        @param shapes: (batch size, sequence length) pairs to run. Defaults to single pairs and 
+            full batches at short, medium and max sequence lengths.
+        """
+        if shapes is None:
+            lengths = sorted({min(length, self.max_length) for length in (32, 128, self.max_length)})
+            shapes = [(batch_size, length) for batch_size in (1, self.batch_size or 32) for length in lengths]
+        shapes = list(shapes)
+        self.__tokenize([("warm up", "warm up")])
+
+        slots = [self.__sessions.get() for _ in range(self.workers)]
+        try:
+            for session, buffers in slots:
+                for batch_size, length in shapes:
+                    onnx_input = buffers.get(batch_size, length)
+                    onnx_input["input_ids"].fill(self.__pad_id)
+                    onnx_input["attention_mask"].fill(1)
+                    if "token_type_ids" in onnx_input:
+                        onnx_input["token_type_ids"].fill(0)
+                    session.run(None, onnx_input)
+        finally:
+            for slot in slots:
+                self.__sessions.put(slot)
+
+    @contextmanager
+    def __stage(self, name: str) -> Iterator[dict[str, int]]:
+        """Time a pipeline stage and report it to registered hooks."""
+        sizes: dict[str, int] = {}
+        if not self.hooks:
+            yield sizes
+            return
+        start = perf_counter()
+        yield sizes
+        elapsed = perf_counter() - start
+        for hook in self.hooks:
+            hook(name, elapsed, sizes)
+
+    def __load_pair_template(self) -> Optional[_PairTemplate]:
+        """
+        Derive pair template from tokenizer and check that pairs assembled from it match pairs 
+        encoded by the tokenizer, with and without truncation. `None` if they do not.
+        """
+        try:
+            template = _PairTemplate(self.__encoder.encode("query", "context"), self.__encoder.truncation)
+        except ValueError:
+            return None
+        
+        short = "query context"
+        long = " ".join(["query context"] * (template.max_length or 8))
+        probes = [(short, short), (short, long), (long, short), (long, f"{long} {short}"), (f"{long} {short}", long)]
+        rows = np.arange(len(probes))
+        expected = _PairEncodings(self.__encoder.encode_batch(probes), self.__pad_id, self.__pad_type_id)
+        assembled = _QueryContextPairs.encode(template, self.__part_encoder, probes, self.__pad_id, self.__pad_type_id)
+        if not np.array_equal(expected.lengths, assembled.lengths):
+            return None
+        expected_arrays, assembled_arrays = np.empty((2, 3, len(probes), int(expected.lengths.max())), dtype=np.int64)
+        expected.fill(rows, *expected_arrays)
+        assembled.fill(rows, *assembled_arrays)
+        return template if np.array_equal(expected_arrays, assembled_arrays) else None
+
+    def __tokenize(self, pairs: Sequence[tuple[str, str]]) -> _PairEncodings | _QueryContextPairs:
+        """Tokenize pairs, each distinct query once when the pair template is supported."""
+        if self.__template is None:
+            return _PairEncodings(self.__encoder.encode_batch(pairs), self.__pad_id, self.__pad_type_id)
+        return _QueryContextPairs.encode(self.__template, self.__part_encoder, pairs, self.__pad_id, self.__pad_type_id)
+
+    def __run(self, tokenized: _PairEncodings | _QueryContextPairs, rows: np.ndarray, length: int) -> np.ndarray:
+        """
+        Run a free ranker session over tokenized rows padded to length and return their logits.
+        Inputs are written into the reusable buffers of the session.
+        """
+        session, buffers = self.__sessions.get()
+        try:
+            onnx_input = buffers.get(len(rows), length)
+            tokenized.fill(rows, **onnx_input)
+            with self.__stage('inference') as sizes:
+                output = session.run(None, onnx_input)[0]
+                sizes.update(batch_size=len(rows), tokens=len(rows) * length)
+        finally:
+            self.__sessions.put((session, buffers))
+        if output.ndim == 1 or output.shape[1] == 1:
+            return output.reshape(len(rows))
+        if not 0 <= self.relevant_class < output.shape[1]:
+            raise ValueError(
+                f"{self.model_id!r} has {output.shape[1]} output classes, relevant class {self.relevant_class} is out of range."
+            )
+        if self.activation == "softmax":
+            return log_odds(output, self.relevant_class)
+        return output[:, self.relevant_class]
+
+    def __compute_logits(
+        self, pairs: list[tuple[str, str]], cancelled: Optional[threading.Event] = None
+    ) -> np.ndarray:
+        """
+        Compute logits of pairs in input order. Pairs are sorted by token length and 
+        split into buckets of `batch_size`, each padded only to its own longest pair.
+        Without `batch_size`, pairs are split into one shard per worker.
+        Buckets not yet run are skipped once `cancelled` is set.
+        """
+        with self.__stage('tokenize') as sizes:
+            tokenized = self.__tokenize(pairs)
+            sizes.update(pairs=len(tokenized.lengths), tokens=int(tokenized.lengths.sum()))
+        return self.__run_buckets(tokenized, cancelled)
+
+    def __run_buckets(
+        self, tokenized: _PairEncodings | _QueryContextPairs, cancelled: Optional[threading.Event] = None
+    ) -> np.ndarray:
+        """Compute logits of tokenized pairs in input order, bucketed by token length."""
+        lengths = tokenized.lengths
+        order = np.argsort(lengths, kind='stable')
+        batch_size = self.batch_size or max(-(-len(order) // self.workers), 1)
+
+        def run_bucket(bucket: np.ndarray) -> np.ndarray:
+            if cancelled is not None and cancelled.is_set():
+                raise CancelledError()
+            return self.__run(tokenized, bucket, length=int(lengths[bucket[-1]]))
+
+        buckets = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+        if self.__executor is None or len(buckets) < 2:
+            results = map(run_bucket, buckets)
+        else:
+            results = self.__executor.map(run_bucket, buckets)
+        
+        logits = np.empty(len(order), dtype=np.float32)
+        for bucket, bucket_logits in zip(buckets, results):
+            logits[bucket] = bucket_logits
+        return logits
+
+    def activate(self, logits: np.ndarray) -> np.ndarray:
+        """
+        Turn relevance logits into scores with the calibration and activation of the model.
+        @param logits: Relevance logits, as returned by `score_pairs(..., raw=True)`.
+        """
+        scale, shift = self.calibration
+        if scale != 1 or shift != 0:
+            logits = logits * np.float32(scale) + np.float32(shift)
+        activation = self.activation if callable(self.activation) else ACTIVATIONS[self.activation]
+        return activation(logits)
+
+    def score_pairs(self, pairs: Sequence[tuple[str, str]], raw: bool = False) -> np.ndarray:
+        """
+        Compute relevance scores of (query, context) pairs in input order.
+        Cached pairs are served from score cache.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits, before calibration and activation, e.g. for score fusion.
+        """
+        return self.__score_pairs(pairs, raw=raw)
+
+    async def ascore_pairs(self, pairs: Sequence[tuple[str, str]], raw: bool = False) -> np.ndarray:
+        """
+        Awaitable `score_pairs`. Scoring runs off the event loop on a bounded executor, at most
+        `max_concurrency` calls at once. Cancelling the call skips buckets not yet run.
+        @param pairs: (query, context) text pairs.
+        @param raw: Return relevance logits, before calibration and activation.
+        """
+        loop = asyncio.get_running_loop()
+        if self.__async_loop is not loop:
+            self.__async_loop, self.__semaphore = loop, asyncio.Semaphore(self.max_concurrency)
+
+        cancelled = threading.Event()
+        async with self.__semaphore:
+            try:
+                return await loop.run_in_executor(self.__async_executor, self.__score_pairs, pairs, cancelled, raw)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+    def __score_pairs(
+        self, pairs: Sequence[tuple[str, str]], cancelled: Optional[threading.Event] = None, raw: bool = False
+    ) -> np.ndarray:
+        """Compute relevance scores of pairs, serving cached pairs from score cache."""
+        if self.cache is None:
+            logits = self.__compute_logits(list(pairs), cancelled)
+        else:
+            with self.__stage('cache') as sizes:
+                keys = [ScoreCache.make_key(self.__cache_model, self.max_length, *pair) for pair in pairs]
+                cached = self.cache.get_many(keys)
+                logits = np.array([np.nan if value is None else value for value in cached], dtype=np.float32)
+                misses = np.flatnonzero(np.isnan(logits))
+                sizes.update(pairs=len(keys), misses=len(misses))
+            if len(misses):
+                logits[misses] = self.__compute_logits([pairs[idx] for idx in misses], cancelled)
+                self.cache.put_many((keys[idx], logits[idx]) for idx in misses)
+        
+        return logits if raw else self.activate(logits)
+
+    def rank(
+        self, contexts: Sequence[_T], scores: np.ndarray, threshold: Optional[float] = None, top_k: Optional[int] = None
+    ) -> list[tuple[float, _T]]:
+        """
+        Order contexts by precomputed relevance scores. Threshold is applied as a mask
+        and top-k winners are picked with a partial sort before ordering.
+        @param contexts: The contexts object.
+        @param scores: Relevance scores of contexts.
+        @param threshold: Get contexts that are equal or higher than threshold value.
+        @param top_k: Get only the k most relevant contexts.
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+        
+        with self.__stage('rank') as sizes:
+            indices = np.arange(len(scores)) if threshold is None else np.flatnonzero(scores >= threshold)
+            if top_k is not None and top_k < len(indices):
+                indices = indices[np.argpartition(-scores[indices], top_k - 1)[:top_k]]
+                indices.sort()
+            indices = indices[np.argsort(-scores[indices], kind='stable')]
+            sizes.update(contexts=len(scores), selected=len(indices))
+            return [(score, contexts[idx]) for score, idx in zip(scores[indices].tolist(), indices)]
+
+    def score_index(
+        self, query: str, index: CorpusIndex, doc_ids: Optional[Iterable[int]] = None, raw: bool = False
+    ) -> np.ndarray:
+        """
+        Compute relevance scores of indexed documents for query. Only the query is tokenized,
+        documents are assembled straight from the memory-mapped token ids of the index.
+        Scores are not cached, the index already skips the costly part of repeated contexts.
+        @param query: The query to use for reranking evaluation.
+        @param index: `CorpusIndex` built with the tokenizer of this pipeline.
+        @param doc_ids: Ids of documents to score, in order. Defaults to every document.
+        @param raw: Return relevance logits, before calibration and activation.
+        """
+        if self.__template is None:
+            raise ValueError(f"{self.model_id!r} tokenizer does not support indexed contexts.")
+        if self.__fingerprint is None:
+            self.__fingerprint = tokenizer_fingerprint(self.__part_encoder)
+        if index.fingerprint != self.__fingerprint:
+            raise ValueError(f"Index was built with {index.model_id!r} tokenizer, not the one of {self.model_id!r}.")
+
+        ids = np.arange(len(index)) if doc_ids is None else np.asarray(
+            doc_ids if isinstance(doc_ids, (list, np.ndarray)) else list(doc_ids), dtype=np.int64)
+        if len(ids) and (ids.min() < 0 or ids.max() >= len(index)):
+            raise ValueError(f"Document ids must be in range [0, {len(index)}).")
+        with self.__stage('tokenize') as sizes:
+            query_ids = np.array(self.__part_encoder.encode(query, add_special_tokens=False).ids, dtype=np.int64)
+            tokenized = _QueryContextPairs(
+                self.__template, [query_ids], np.zeros(len(ids), dtype=np.intp), index.tokens,
+                index.offsets[ids], index.lengths(ids), self.__pad_id, self.__pad_type_id
+            )
+            sizes.update(pairs=len(ids), tokens=int(tokenized.lengths.sum()))
+        logits = self.__run_buckets(tokenized)
+        return logits if raw else self.activate(logits)
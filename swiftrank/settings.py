@@ -1,9 +1,8 @@
 import os
+import shutil
 import zipfile
-import requests
 from pathlib import Path
-
-from tqdm import tqdm
+from typing import Callable, Union
 
 DEFAULT_CACHE_DIR = Path(os.getenv(
     "SWIFTRANK_CACHE", 
@@ -22,29 +21,145 @@ MODEL_MAP = {
 DEFAULT_MODEL = os.getenv("SWIFTRANK_MODEL", "ms-marco-TinyBERT-L-2-v2")
 """Default Model to use"""
 
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+def _env_mapping(name: str) -> dict[str, str]:
+    """Read `key=value` pairs, comma separated, from an environment variable."""
+    pairs = (item.split("=", 1) for item in os.getenv(name, "").split(",") if "=" in item)
+    return {key.strip(): value.strip() for key, value in pairs}
+
+INTRA_OP_NUM_THREADS = int(os.getenv("SWIFTRANK_INTRA_OP_THREADS", 0))
+"""Threads used to parallelize execution within operators (0 lets onnxruntime decide)"""
+
+INTER_OP_NUM_THREADS = int(os.getenv("SWIFTRANK_INTER_OP_THREADS", 0))
+"""Threads used to parallelize execution across operators (0 lets onnxruntime decide)"""
+
+GRAPH_OPTIMIZATION_LEVEL = os.getenv("SWIFTRANK_GRAPH_OPTIMIZATION", "all")
+"""Graph optimization level [ disable | basic | extended | all ]"""
+
+EXECUTION_MODE = os.getenv("SWIFTRANK_EXECUTION_MODE", "sequential")
+"""Execution mode [ sequential | parallel ]"""
+
+ENABLE_MEM_ARENA = _env_flag("SWIFTRANK_MEM_ARENA", True)
+"""Use onnxruntime CPU memory arena"""
+
+SAVE_OPTIMIZED_MODEL = _env_flag("SWIFTRANK_SAVE_OPTIMIZED", False)
+"""Save optimized graph into model cache directory and reuse it on later startups"""
+
+EXECUTION_PROVIDERS = [
+    p.strip() for p in os.getenv("SWIFTRANK_PROVIDERS", "CPUExecutionProvider").split(",") if p.strip()
+]
+"""Onnxruntime execution providers in order of preference"""
+
+MODEL_URL = os.getenv("SWIFTRANK_MODEL_URL", "https://huggingface.co/prithivida/flashrank/resolve/main").rstrip("/")
+"""Base URL of model archives, fetched as `<MODEL_URL>/<model_id>.zip`"""
+
+DOWNLOAD_CONNECTIONS = int(os.getenv("SWIFTRANK_DOWNLOAD_CONNECTIONS", 4))
+"""Max parallel range requests per model download"""
+
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("SWIFTRANK_DOWNLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+"""Bytes per range request of model downloads"""
+
+READY_MARKER = ".ready"
+"""File marking a completely extracted and verified model directory"""
+
+MODEL_FILES = ("config.json", "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json")
+"""Files every model directory must contain besides the model"""
+
+MODEL_VARIANTS = ("int8", "fp16")
+"""Reduced precision variants `swiftrank optimize` produces from cached models"""
+
+DAEMON_SOCKET = Path(os.getenv("SWIFTRANK_DAEMON_SOCKET", DEFAULT_CACHE_DIR / "daemon.sock"))
+"""Unix socket of the `swiftrank daemon` process keeping pipelines loaded between CLI invocations"""
+
+USE_DAEMON = _env_flag("SWIFTRANK_DAEMON", True)
+"""Rerank through a running daemon from the CLI, falling back to an in-process pipeline when none is running"""
+
+CASCADE_KEEP = int(os.getenv("SWIFTRANK_CASCADE_KEEP", 50))
+"""Contexts per query a cascade rescores with its expensive model when neither keep nor margin is given"""
+
+MODEL_ACTIVATIONS: dict[str, Union[str, Callable]] = _env_mapping("SWIFTRANK_ACTIVATIONS")
+"""Activation per model id, sigmoid for models not listed. Names of `ranker.ACTIVATIONS` read as `model=activation` pairs from `SWIFTRANK_ACTIVATIONS`, values may also be callables"""
+
+MODEL_RELEVANT_CLASS = {model: int(value) for model, value in _env_mapping("SWIFTRANK_RELEVANT_CLASS").items()}
+"""Output column holding relevance of models with several output classes, 1 for models not listed"""
+
+MODEL_CALIBRATION = {
+    model: (float(scale), float(shift or 0))
+    for model, (scale, _, shift) in ((model, value.partition(":")) for model, value in _env_mapping("SWIFTRANK_CALIBRATION").items())
+}
+"""Platt scaling `(scale, shift)` of relevance logits per model, applied before the activation. Read as `model=scale:shift` pairs"""
+
+def _is_complete_model_dir(model_dir: Path, model_id: str) -> bool:
+    """Whether a directory extracted before ready markers existed holds readable model files."""
+    import json
+    model_file = model_dir / MODEL_MAP.get(model_id, MODEL_FILES[0])
+    if not (model_dir.is_dir() and model_file.is_file()):
+        return False
+    try:
+        for name in MODEL_FILES:
+            with open(model_dir / name, "rb") as handle:
+                json.load(handle)
+        try:
+            import onnx
+        except ImportError:
+            # Parsing the graph is enough to tell a truncated file apart.
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        else:
+            onnx.checker.check_model(str(model_file))
+    except Exception:
+        return False
+    return True
+
 def get_model_path(model_id: str) -> Path:
     model_dir = DEFAULT_CACHE_DIR / model_id
-    if model_dir.exists():
+    if (model_dir / READY_MARKER).exists():
         return model_dir 
 
-    local_zip_file = str(DEFAULT_CACHE_DIR / f"{model_id}.zip")
-    model_url = f"https://huggingface.co/prithivida/flashrank/resolve/main/{model_id}.zip"
+    from .download import download, file_lock
+    with file_lock(DEFAULT_CACHE_DIR / f"{model_id}.lock"):
+        if (model_dir / READY_MARKER).exists():
+            return model_dir
+        # Directories extracted before ready markers existed are accepted once their files load,
+        # half-extracted ones are downloaded again.
+        if _is_complete_model_dir(model_dir, model_id):
+            (model_dir / READY_MARKER).touch()
+            return model_dir
 
-    with requests.get(model_url, stream=True) as r:
-        r.raise_for_status()
-        total_size = int(r.headers.get('content-length', 0))
-        progress_bar = tqdm(
-            desc=model_id, total=total_size, unit='iB', unit_scale=True, unit_divisor=1024,
+        local_zip_file = DEFAULT_CACHE_DIR / f"{model_id}.zip"
+        download(
+            f"{MODEL_URL}/{model_id}.zip", local_zip_file, 
+            connections=DOWNLOAD_CONNECTIONS, chunk_size=DOWNLOAD_CHUNK_SIZE, desc=model_id
         )
-        with open(local_zip_file, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                progress_bar.update(f.write(chunk))
-        
-        progress_bar.desc = local_zip_file
-        progress_bar.close()
-
-    with zipfile.ZipFile(local_zip_file, 'r') as zip_ref:
-        zip_ref.extractall(DEFAULT_CACHE_DIR)
-
-    os.remove(local_zip_file)
-    return model_dir
\ No newline at end of file
+        extract_dir = DEFAULT_CACHE_DIR / f".{model_id}.extract"
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        try:
+            with zipfile.ZipFile(local_zip_file, 'r') as zip_ref:
+                if zip_ref.testzip() is not None:
+                    raise zipfile.BadZipFile(f"Corrupted {local_zip_file.name!r} archive.")
+                zip_ref.extractall(extract_dir)
+        except zipfile.BadZipFile:
+            os.remove(local_zip_file)
+            raise
+
+        extracted = extract_dir / model_id if (extract_dir / model_id).is_dir() else extract_dir
+        shutil.rmtree(model_dir, ignore_errors=True)
+        os.replace(extracted, model_dir)
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        (model_dir / READY_MARKER).touch()
+        os.remove(local_zip_file)
+    return model_dir
+
+def get_variant_path(model_id: str, variant: str) -> Path:
+    """Path of a model variant file, next to the original model file."""
+    if variant not in MODEL_VARIANTS:
+        raise LookupError(f"{variant!r} variant not available, choose from {', '.join(MODEL_VARIANTS)}.")
+    model_file = Path(MODEL_MAP[model_id])
+    return get_model_path(model_id=model_id) / f"{model_file.stem}.{variant}{model_file.suffix}"
@@ -100,6 +100,15 @@ def test_arrary_as_input():
     assert response.status_code == 200
     assert response.json() == FINAL_OUTPUT
 
+def test_threshold_is_not_bounded():
+    contexts = read_file_as_context_field('contexts', rl=True)
+    for threshold, expected in ((-1.0, len(contexts)), (1.5, 0)):
+        response = requests.post(
+            url=ENDPOINT, json=BODY | {'query': "Jujutsu Season 2", 'contexts': contexts, 'threshold': threshold}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == expected
+
 def test_object_as_input():
     response = requests.post(
         url=ENDPOINT, json=BODY | {
@@ -115,3 +124,219 @@ def test_object_as_input():
     )
     assert response.status_code == 200
     assert response.json() == FINAL_OUTPUT[0:3]
+
+def test_top_k_parameter():
+    response = requests.post(
+        url=ENDPOINT, json=BODY | {
+            'query': "Jujutsu Season 2",
+            'contexts': read_file_as_context_field('contexts', rl=True),
+            'top_k': 4}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == FINAL_OUTPUT[0:4]
+
+def test_stream_parameter():
+    body = BODY | {
+        'query': "Jujutsu Season 2",
+        'contexts': read_file_as_context_field('contexts', rl=True),
+        'map_score': True
+    }
+    response = requests.post(url=ENDPOINT, json=body | {'stream': True}, stream=True)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.iter_lines()] == requests.post(url=ENDPOINT, json=body).json()
+
+def test_cascade_model_spec():
+    contexts = read_file_as_context_field('contexts', rl=True)
+    body = BODY | {'query': "Jujutsu Season 2", 'contexts': contexts, 'map_score': True}
+    response = requests.post(url=ENDPOINT, json=body | {
+        'model': "ms-marco-TinyBERT-L-2-v2>ms-marco-MiniLM-L-12-v2", 'keep': 5})
+    assert response.status_code == 200
+    survivors = requests.post(url=ENDPOINT, json=BODY | {
+        'query': "Jujutsu Season 2", 'contexts': contexts, 'top_k': 5}).json()
+    rescored = requests.post(url=ENDPOINT, json=body | {
+        'model': "ms-marco-MiniLM-L-12-v2", 'contexts': survivors}).json()
+    assert [item['context'] for item in response.json()] == [item['context'] for item in rescored]
+    assert all(abs(a['score'] - b['score']) < 1e-4 for a, b in zip(response.json(), rescored))
+
+    response = requests.post(url=ENDPOINT + '/batch', json={
+        'model': "ms-marco-TinyBERT-L-2-v2>ms-marco-MiniLM-L-12-v2", 'keep': 2,
+        'queries': ["Jujutsu Season 2", "Jujutsu Season 2"], 'contexts': [contexts, contexts[:3]]})
+    assert response.status_code == 200
+    assert [len(reranked) for reranked in response.json()] == [2, 2]
+
+    response = requests.post(url=ENDPOINT, json=body | {'model': "ms-marco-TinyBERT-L-2-v2>no-model"})
+    assert response.status_code == 404
+    response = requests.post(url=ENDPOINT, json=body | {'model': "rank-T5-flan>rank-T5-flan>rank-T5-flan"})
+    assert response.status_code == 422
+
+def test_batch_rerank_endpoint():
+    queries = ["Jujutsu Season 2", "Shingeki no Kyojin", "Monogatari"]
+    schema = {'pre': '.categories[].items', 'ctx': '.name', 'post': '.name'}
+    contexts = read_file_as_context_field('contexts.json')
+    response = requests.post(
+        url=ENDPOINT + '/batch', json={
+            'model': BODY['model'], 'queries': queries, 'contexts': [contexts] * 3,
+            'top_k': 3, 'map_score': True, 'schema': schema
+        }
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == len(queries)
+    for query, batched in zip(queries, response.json()):
+        single = requests.post(url=ENDPOINT, json=BODY | {
+            'query': query, 'contexts': contexts, 'top_k': 3, 'map_score': True, 'schema': schema
+        }).json()
+        assert [item['context'] for item in batched] == [item['context'] for item in single]
+        assert all(abs(a['score'] - b['score']) < 1e-4 for a, b in zip(batched, single))
+
+    response = requests.post(url=ENDPOINT + '/batch', json={'queries': ["a", "b"], 'contexts': [["x"]]})
+    assert response.status_code == 422
+
+def test_batch_scheduler_merges_concurrent_requests():
+    import asyncio
+    from swiftrank import ReRankPipeline
+    from swiftrank.interface.batching import BatchScheduler
+
+    contexts = read_file_as_context_field('contexts', rl=True)
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2")
+    scheduler = BatchScheduler(pipeline, max_batch_size=64, max_wait=0.01)
+
+    async def score_concurrently():
+        scores = await asyncio.gather(*[
+            scheduler.score_pairs([(query, context) for context in contexts]) 
+            for query in ("Jujutsu Season 2", "Shingeki no Kyojin")
+        ])
+        await scheduler.close()
+        return scores
+
+    scores = asyncio.run(score_concurrently())
+    reranked = [context for _, context in pipeline.rank(contexts, scores[0])]
+    assert reranked == FINAL_OUTPUT
+    assert len(scores[1]) == len(contexts)
+
+def test_batch_scheduler_scores_with_pipeline_concurrency():
+    import asyncio
+    import numpy as np
+    from swiftrank.interface.batching import BatchScheduler
+
+    class Pipeline:
+        def __init__(self):
+            self.batches = []
+        def score_pairs(self, pairs):
+            raise AssertionError("merged batches must be scored with ascore_pairs")
+        async def ascore_pairs(self, pairs):
+            self.batches.append(len(pairs))
+            return np.arange(len(pairs), dtype=np.float32)
+
+    pipeline = Pipeline()
+    scheduler = BatchScheduler(pipeline, max_batch_size=64, max_wait=0.01)
+
+    async def score_concurrently():
+        scores = await asyncio.gather(*[scheduler.score_pairs([(query, "a"), (query, "b")]) for query in "xy"])
+        await scheduler.close()
+        return scores
+
+    assert [score.tolist() for score in asyncio.run(score_concurrently())] == [[0, 1], [2, 3]]
+    assert pipeline.batches == [4]
+
+def test_metrics_endpoint():
+    requests.post(
+        url=ENDPOINT, json=BODY | {
+            'query': "Jujutsu Season 2",
+            'contexts': read_file_as_context_field('contexts', rl=True)}
+    )
+    response = requests.get(url=ENDPOINT.replace('/rerank', '/metrics'))
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'swiftrank_requests_total{model="ms-marco-TinyBERT-L-2-v2"}' in response.text
+    assert 'stage="inference"' in response.text
+
+def test_readiness_endpoint():
+    response = requests.get(url=ENDPOINT.replace('/rerank', '/ready'))
+    assert response.status_code == 200
+    assert response.json()['ready'] is True
+
+def test_resident_models_endpoint():
+    requests.post(url=ENDPOINT, json=BODY | {'query': "Jujutsu Season 2", 'contexts': ["Jujutsu Kaisen"]})
+    response = requests.get(url=ENDPOINT.replace('/rerank', '/models/resident'))
+    assert response.status_code == 200
+    models = {model['model']: model for model in response.json()['models']}
+    assert models[BODY['model']]['footprint_bytes'] > 0
+
+def test_pipeline_registry_unloads_idle_models():
+    import time
+    from swiftrank import ReRankPipeline
+    from swiftrank.interface.registry import PipelineRegistry
+
+    registry = PipelineRegistry(ReRankPipeline.from_model_id, idle_timeout=0.05)
+    pipeline = registry.get(BODY['model'])
+    assert registry.get(BODY['model']) is pipeline
+    assert [model['model'] for model in registry.resident()] == [BODY['model']]
+    time.sleep(0.1)
+    assert registry.evict_idle() == [BODY['model']]
+    assert BODY['model'] not in registry and registry.memory() == 0
+
+def test_pipeline_registry_evicts_after_successful_load():
+    import threading
+    from swiftrank.interface.registry import PipelineRegistry
+
+    evicted, release = [], threading.Event()
+    def factory(model_id: str):
+        if model_id == "rank-T5-flan":
+            raise RuntimeError("download failed")
+        release.wait(5)
+        return object()
+
+    registry = PipelineRegistry(factory, max_models=1, on_evict=evicted.append, estimator=lambda _: 0)
+    release.set()
+    registry.get(BODY['model'])
+    try:
+        registry.get("rank-T5-flan")
+    except Exception:
+        pass
+    assert BODY['model'] in registry and evicted == []
+
+    release.clear()
+    threads = [
+        threading.Thread(target=registry.get, args=(model_id,))
+        for model_id in ("ms-marco-MiniLM-L-12-v2", "ms-marco-MultiBERT-L-12")
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(registry.resident()) == 1
+    assert BODY['model'] in evicted
+
+def test_unknown_model_spec_is_not_loaded(monkeypatch):
+    from fastapi.testclient import TestClient
+    from swiftrank import settings
+    from swiftrank.interface import api
+
+    def get_model_path(model_id: str):
+        raise AssertionError(f"{model_id!r} should not be downloaded")
+    monkeypatch.setattr(settings, "get_model_path", get_model_path)
+
+    client = TestClient(api.server)
+    specs = (" ms-marco-TinyBERT-L-2-v2", "no-model", "ms-marco-TinyBERT-L-2-v2> ms-marco-MiniLM-L-12-v2")
+    for model in specs:
+        response = client.post('/rerank', json=BODY | {'model': model, 'contexts': ["context"]})
+        assert response.status_code == 404
+        response = client.post('/rerank/batch', json={'model': model, 'queries': ["query"], 'contexts': [["context"]]})
+        assert response.status_code == 404
+    assert not any(f'model="{model}"' in api.metrics.render() for model in specs)
+
+def test_serve_configures_pipeline_batch_size(monkeypatch):
+    import uvicorn
+    from swiftrank.interface import api
+    from swiftrank.interface.registry import PipelineRegistry
+
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: None)
+    monkeypatch.setattr(api, "pipeline_config", dict(api.pipeline_config))
+    monkeypatch.setattr(api, "batching_config", dict(api.batching_config))
+    monkeypatch.setattr(api, "registry", PipelineRegistry(api.create_pipeline))
+    api._serve(host='127.0.0.1', port=0, batch_size=2)
+    pipeline = api.create_pipeline(BODY['model'])
+    assert pipeline.batch_size == 2
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 from pathlib import Path
 from subprocess import Popen, PIPE
 
@@ -98,4 +99,119 @@ def test_handling_yamllines():
 
     stdout, stderr = process.communicate()   
     assert stdout.decode().strip() == "Monogatari Series: Second Season"    
-    assert stderr.decode().strip() == ""
\ No newline at end of file
+    assert stderr.decode().strip() == ""
+
+
+def test_print_top_k_contexts():
+    process = Popen(
+        [*exec_args, '-q', 'Jujutsu Kaisen: Season 2', '-k', '2'], stdin=PIPE, stdout=PIPE, stderr=PIPE
+    )
+    
+    process.stdin.write(read_file_bytes('contexts'))
+    process.stdin.close()
+    
+    stdout, stderr = process.communicate()
+    rlist = [i.strip() for i in stdout.decode().split('\n') if i]
+    assert rlist == ['Jujutsu Kaisen 2nd Season', 'Jujutsu Kaisen 2nd Season Recaps']
+    assert stderr.decode().strip() == ""
+
+def test_stream_top_k_contexts():
+    process = Popen(
+        [*exec_args, '-q', 'Jujutsu Kaisen: Season 2', '-k', '2', '-s', '--chunk-size', '3'], stdin=PIPE, stdout=PIPE, stderr=PIPE
+    )
+    
+    process.stdin.write(read_file_bytes('contexts'))
+    process.stdin.close()
+    
+    stdout, stderr = process.communicate()
+    rlist = [i.strip() for i in stdout.decode().split('\n') if i]
+    assert rlist == ['Jujutsu Kaisen 2nd Season', 'Jujutsu Kaisen 2nd Season Recaps']
+    assert stderr.decode().strip() == ""
+
+def test_stream_jsonlines_with_post_processing():
+    process = Popen(
+        [*exec_args, '-q', 'Monogatari Series: Season 2', '-s', '--chunk-size', '2', 'process', '-c', '.name', '-p', '.payload.aired', '-f'], stdin=PIPE, stdout=PIPE, stderr=PIPE
+    )
+    
+    process.stdin.write(read_file_bytes('contexts.jsonl'))
+    process.stdin.close()
+
+    stdout, stderr = process.communicate()   
+    assert stdout.decode().strip() == "Jul 7, 2013 to Dec 29, 2013"    
+    assert stderr.decode().strip() == ""
+
+def test_stream_rejects_pre_processing():
+    process = Popen(
+        [*exec_args, '-q', 'Monogatari Series: Season 2', '-s', '-k', '1', 'process', '-r', '.categories[].items', '-c', '.name'], 
+        stdin=PIPE, stdout=PIPE, stderr=PIPE
+    )
+    stdout, stderr = process.communicate(read_file_bytes('contexts.jsonl'))
+    assert process.returncode == 1 and stdout.decode() == ""
+    assert stderr.decode().strip() == "Stream mode reads one context per line, --pre is not supported."
+
+def test_rerank_through_daemon(tmp_path):
+    env = {**os.environ, "SWIFTRANK_DAEMON_SOCKET": str(tmp_path / "daemon.sock")}
+    daemon = Popen([*exec_args, 'daemon'], stdout=PIPE, stderr=PIPE, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while not (tmp_path / "daemon.sock").exists():
+            assert daemon.poll() is None and time.monotonic() < deadline
+            time.sleep(0.05)
+
+        process = Popen(
+            [*exec_args, '-q', 'Jujutsu Kaisen: Season 2'], stdin=PIPE, stdout=PIPE, stderr=PIPE,
+            env={**env, "SWIFTRANK_MODEL": "unknown-model"}
+        )
+        stdout, stderr = process.communicate(read_file_bytes('contexts'))
+        assert process.returncode == 1
+        assert stderr.decode().strip() == "swiftrank daemon: ValueError: 'unknown-model' model is not available."
+
+        process = Popen(
+            [*exec_args, '-q', 'Jujutsu Kaisen: Season 2', '-k', '2'], stdin=PIPE, stdout=PIPE, stderr=PIPE, env=env
+        )
+        stdout, stderr = process.communicate(read_file_bytes('contexts'))
+        rlist = [i.strip() for i in stdout.decode().split('\n') if i]
+        assert rlist == ['Jujutsu Kaisen 2nd Season', 'Jujutsu Kaisen 2nd Season Recaps']
+        assert stderr.decode().strip() == ""
+
+        status = Popen([*exec_args, 'daemon', '--status'], stdout=PIPE, stderr=PIPE, env=env)
+        assert "ms-marco-TinyBERT-L-2-v2" in status.communicate()[0].decode()
+    finally:
+        Popen([*exec_args, 'daemon', '--stop'], stdout=PIPE, stderr=PIPE, env=env).communicate()
+        daemon.wait(timeout=10)
+    assert not (tmp_path / "daemon.sock").exists()
+
+def test_daemon_closing_connection(tmp_path):
+    import socket
+    import threading
+    path = tmp_path / "daemon.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen()
+
+    def close_connections():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            with connection:
+                connection.recv(65536)
+    threading.Thread(target=close_connections, daemon=True).start()
+    try:
+        env = {**os.environ, "SWIFTRANK_DAEMON_SOCKET": str(path)}
+        for args in (['-q', 'Jujutsu Kaisen: Season 2'], ['-q', 'Jujutsu Kaisen: Season 2', '-s', '-k', '2']):
+            process = Popen([*exec_args, *args], stdin=PIPE, stdout=PIPE, stderr=PIPE, env=env)
+            stdout, stderr = process.communicate(read_file_bytes('contexts'))
+            assert process.returncode == 1
+            assert stderr.decode().strip() == "swiftrank daemon: closed the connection."
+    finally:
+        listener.close()
+
+def test_package_import_is_lazy():
+    process = Popen([
+        sys.executable, '-c', 
+        "import sys, swiftrank.interface.cli; print(any(m in sys.modules for m in ('numpy', 'onnxruntime', 'tokenizers')))"
+    ], stdout=PIPE, stderr=PIPE)
+    stdout, _ = process.communicate()
+    assert stdout.decode().strip() == "False"
@@ -40,3 +40,238 @@ def test_invoke_with_key_parameter():
     output = PIPELINE.invoke(query=QUERY, contexts=context_map, key=lambda x: x['content'])
     for idx in range(len(output)):
         assert (output[idx]['content'] == RERANKED[idx][1])
+
+def test_invoke_with_batch_size():
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", batch_size=2)
+    output = pipeline.invoke_with_score(query=QUERY, contexts=CONTEXTS)
+    for idx in range(len(output)):
+        assert (f"{output[idx][0]:.5f}" == f"{RERANKED[idx][0]:.5f}")
+        assert (output[idx][1] == RERANKED[idx][1])
+
+def test_invoke_with_top_k_parameter():
+    output = PIPELINE.invoke(query=QUERY, contexts=CONTEXTS, top_k=2)
+    assert len(output) == 2
+    for idx in range(len(output)):
+        assert (output[idx] == RERANKED[idx][1])
+
+def test_invoke_many():
+    queries = [QUERY, "How do I reduce model size?", QUERY]
+    contexts_per_query = [CONTEXTS, CONTEXTS[::-1], []]
+    batched = PIPELINE.invoke_many_with_score(queries, contexts_per_query, top_k=2)
+    assert len(batched) == 3 and batched[2] == []
+    for query, contexts, reranked in zip(queries[:2], contexts_per_query[:2], batched):
+        single = PIPELINE.invoke_with_score(query=query, contexts=contexts, top_k=2)
+        assert [context for _, context in reranked] == [context for _, context in single]
+        assert all(abs(a - b) < 1e-4 for (a, _), (b, _) in zip(reranked, single))
+
+    assert PIPELINE.invoke_many([QUERY], [[{'text': CONTEXTS[0]}]], key=lambda x: x['text']) == [[{'text': CONTEXTS[0]}]]
+
+def test_pipeline_with_session_options():
+    from swiftrank import create_session_options
+    pipeline = ReRankPipeline.from_model_id(
+        "ms-marco-TinyBERT-L-2-v2", 
+        session_options=create_session_options(intra_op_threads=1, graph_optimization="basic")
+    )
+    output = pipeline.invoke(query=QUERY, contexts=CONTEXTS)
+    for idx in range(len(output)):
+        assert (output[idx] == RERANKED[idx][1])
+
+def test_saved_optimized_graph_keeps_session_options():
+    import onnxruntime as ort
+    from swiftrank import Ranker, settings, create_session_options
+    options = create_session_options(graph_optimization="extended")
+    for _ in range(2):
+        Ranker("ms-marco-TinyBERT-L-2-v2", session_options=options, save_optimized=True)
+        assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        assert options.optimized_model_filepath == ""
+    saved = list(settings.get_model_path("ms-marco-TinyBERT-L-2-v2").glob(f"*.extended.ort-{ort.__version__}.*.onnx"))
+    assert len(saved) == 1
+
+def test_invoke_with_score_cache():
+    from swiftrank import ScoreCache
+    cache = ScoreCache(maxsize=16)
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", cache=cache)
+    for _ in range(2):
+        output = pipeline.invoke_with_score(query=QUERY, contexts=CONTEXTS)
+        for idx in range(len(output)):
+            assert (f"{output[idx][0]:.5f}" == f"{RERANKED[idx][0]:.5f}")
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['size']) == (len(CONTEXTS), len(CONTEXTS), len(CONTEXTS))
+
+def test_invoke_with_workers():
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", workers=2, batch_size=2)
+    output = pipeline.invoke_with_score(query=QUERY, contexts=CONTEXTS)
+    for idx in range(len(output)):
+        assert (f"{output[idx][0]:.5f}" == f"{RERANKED[idx][0]:.5f}")
+        assert (output[idx][1] == RERANKED[idx][1])
+
+def test_invoke_with_stage_hook():
+    recorded = []
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", batch_size=2)
+    pipeline.add_hook(lambda stage, seconds, sizes: recorded.append((stage, seconds, sizes)))
+    pipeline.invoke(query=QUERY, contexts=CONTEXTS)
+    
+    stages = [stage for stage, _, _ in recorded]
+    assert stages == ['tokenize', 'inference', 'inference', 'inference', 'rank']
+    assert all(seconds >= 0 for _, seconds, _ in recorded)
+    assert recorded[0][2]['pairs'] == len(CONTEXTS)
+    assert sum(sizes['batch_size'] for stage, _, sizes in recorded if stage == 'inference') == len(CONTEXTS)
+
+def test_score_pairs_matches_pair_encoding():
+    import numpy as np
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", tk_max_length=32)
+    pairs = [(QUERY, context) for context in CONTEXTS] + [(CONTEXTS[2], QUERY), (CONTEXTS[2], CONTEXTS[0])]
+    
+    tokenized = pipeline.tokenizer.encode_batch(pairs)
+    logits = pipeline.ranker.run(None, {
+        "input_ids": np.array([encoding.ids for encoding in tokenized], dtype=np.int64),
+        "attention_mask": np.array([encoding.attention_mask for encoding in tokenized], dtype=np.int64),
+        "token_type_ids": np.array([encoding.type_ids for encoding in tokenized], dtype=np.int64),
+    })[0]
+    logits = logits[:, 1] if logits.shape[1] > 1 else logits.flatten()
+    assert np.allclose(pipeline.score_pairs(pairs), 1 / (1 + np.exp(-logits)), atol=1e-6)
+
+def test_score_pairs_with_reused_input_buffers():
+    import numpy as np
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", batch_size=2)
+    pairs = [(QUERY, context) for context in CONTEXTS]
+    expected = pipeline.score_pairs(pairs)
+    pipeline.score_pairs([(context, context) for context in CONTEXTS])
+    assert np.array_equal(pipeline.score_pairs(pairs[::-1]), expected[::-1])
+
+def test_ainvoke_with_score():
+    import asyncio
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", max_concurrency=1)
+    
+    async def rerank():
+        return await asyncio.gather(
+            pipeline.ainvoke_with_score(query=QUERY, contexts=CONTEXTS),
+            pipeline.ainvoke(query=QUERY, contexts=CONTEXTS, top_k=2)
+        )
+    
+    with_score, top_contexts = asyncio.run(rerank())
+    for idx in range(len(with_score)):
+        assert (f"{with_score[idx][0]:.5f}" == f"{RERANKED[idx][0]:.5f}")
+        assert (with_score[idx][1] == RERANKED[idx][1])
+    assert top_contexts == [context for _, context in RERANKED[:2]]
+
+def test_ainvoke_cancellation():
+    import asyncio
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", batch_size=1, max_concurrency=1)
+    
+    async def rerank():
+        task = asyncio.create_task(pipeline.ainvoke(query=QUERY, contexts=CONTEXTS * 50))
+        await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return await pipeline.ainvoke(query=QUERY, contexts=CONTEXTS)
+    
+    output = asyncio.run(rerank())
+    for idx in range(len(output)):
+        assert (output[idx] == RERANKED[idx][1])
+
+def test_warm_up():
+    recorded = []
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", workers=2)
+    pipeline.add_hook(lambda stage, seconds, sizes: recorded.append(stage))
+    pipeline.warm_up(shapes=[(1, 8), (4, 16)])
+    assert recorded == []
+    output = pipeline.invoke(query=QUERY, contexts=CONTEXTS)
+    for idx in range(len(output)):
+        assert (output[idx] == RERANKED[idx][1])
+
+def test_tokenizer_loads_configured_cache_and_lazy_vocab():
+    from swiftrank import Tokenizer
+    built = Tokenizer("ms-marco-TinyBERT-L-2-v2", max_length=64)
+    assert (built.model_dir / "tokenizer.configured-64.json").exists()
+    cached = Tokenizer("ms-marco-TinyBERT-L-2-v2", max_length=64)
+    assert not hasattr(cached.instance, 'vocab')
+    assert cached.instance.truncation == built.instance.truncation
+    assert cached.instance.padding == built.instance.padding
+
+    pairs = [(QUERY, context) for context in CONTEXTS]
+    assert [encoding.ids for encoding in cached.instance.encode_batch(pairs)] == \
+        [encoding.ids for encoding in built.instance.encode_batch(pairs)]
+    assert cached.vocab[cached.ids_to_tokens[0]] == 0
+
+def test_reduced_precision_variants():
+    import pytest
+    pytest.importorskip("onnx")
+    from swiftrank.optimize import optimize, load_report
+    for variant in ("int8", "fp16"):
+        report = optimize("ms-marco-TinyBERT-L-2-v2", variant, force=True, repeat=1)
+        assert load_report("ms-marco-TinyBERT-L-2-v2", variant) == report
+        assert report["variant"] == variant and report["size_bytes"] < report["original_size_bytes"]
+        assert set(report["agreement"]) == {"max_abs_diff", "mean_abs_diff", "top1", "spearman"}
+
+        pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2", variant=variant)
+        pairs = [(QUERY, context) for context in CONTEXTS]
+        differences = [abs(a - b) for a, b in zip(pipeline.score_pairs(pairs), PIPELINE.score_pairs(pairs))]
+        assert len(differences) == len(CONTEXTS) and max(differences) <= report["agreement"]["max_abs_diff"] + 0.05
+
+def test_invoke_index(tmp_path):
+    from swiftrank import Tokenizer, CorpusIndex
+    from swiftrank.index import build_index
+    build_index(tmp_path / "corpus.idx", CONTEXTS, Tokenizer("ms-marco-TinyBERT-L-2-v2"), chunk_size=2)
+    index = CorpusIndex(tmp_path / "corpus.idx")
+    assert len(index) == len(CONTEXTS)
+
+    output = PIPELINE.invoke_index(query=QUERY, index=index)
+    for idx in range(len(output)):
+        assert abs(output[idx][0] - RERANKED[idx][0]) < 1e-5
+        assert CONTEXTS[output[idx][1]] == RERANKED[idx][1]
+
+    scores = PIPELINE.score_pairs([(QUERY, context) for context in CONTEXTS])
+    assert PIPELINE.invoke_index(query=QUERY, index=index, doc_ids=[4, 1, 3], top_k=2) == \
+        sorted([(float(scores[idx]), idx) for idx in (4, 1, 3)], reverse=True)[:2]
+
+def test_cascade_pipeline():
+    from swiftrank import CascadePipeline
+    expensive = ReRankPipeline.from_model_id("ms-marco-MiniLM-L-12-v2")
+    pipeline = CascadePipeline(PIPELINE, expensive, keep=3)
+    output = pipeline.invoke_with_score(query=QUERY, contexts=CONTEXTS)
+    survivors = PIPELINE.invoke(query=QUERY, contexts=CONTEXTS, top_k=3)
+    assert output == expensive.invoke_with_score(query=QUERY, contexts=survivors)
+
+    scores = PIPELINE.score_pairs([(QUERY, context) for context in CONTEXTS])
+    pipeline = CascadePipeline(PIPELINE, expensive, margin=0.1)
+    output = pipeline.invoke(query=QUERY, contexts=CONTEXTS)
+    assert sorted(output) == sorted(
+        context for context, score in zip(CONTEXTS, scores) if score >= scores.max() - 0.1)
+    assert pipeline.invoke_many(queries=[QUERY, QUERY[::-1]], contexts_per_query=[CONTEXTS, CONTEXTS], top_k=1) == \
+        [pipeline.invoke(query=QUERY, contexts=CONTEXTS, top_k=1), pipeline.invoke(query=QUERY[::-1], contexts=CONTEXTS, top_k=1)]
+
+    # Repeated queries are pruned separately, each keeps its own survivors.
+    pipeline = CascadePipeline(PIPELINE, expensive, keep=2)
+    output = pipeline.invoke_many(queries=[QUERY, QUERY], contexts_per_query=[CONTEXTS, CONTEXTS[:3]])
+    assert [len(reranked) for reranked in output] == [2, 2]
+    assert output[0] == pipeline.invoke(query=QUERY, contexts=CONTEXTS)
+    assert output[1] == pipeline.invoke(query=QUERY, contexts=CONTEXTS[:3])
+
+def test_score_post_processing(monkeypatch):
+    import numpy as np
+    from swiftrank import settings
+    from swiftrank.ranker import sigmoid, log_odds
+    with np.errstate(over='raise', invalid='raise', divide='raise'):
+        assert sigmoid(np.array([-1e4, 0.0, 1e4], dtype=np.float32)).tolist() == [0.0, 0.5, 1.0]
+        output = np.array([[1e4, -1e4, 3.0], [0.5, 2.0, -1.0]], dtype=np.float32)
+        softmax = np.exp(output - output.max(axis=1, keepdims=True))
+        softmax /= softmax.sum(axis=1, keepdims=True)
+        assert np.allclose(sigmoid(log_odds(output, 1)), softmax[:, 1])
+
+    pairs = [(QUERY, context) for context in CONTEXTS]
+    logits = PIPELINE.score_pairs(pairs, raw=True)
+    assert isinstance(logits, np.ndarray) and np.allclose(sigmoid(logits), PIPELINE.score_pairs(pairs))
+
+    monkeypatch.setitem(settings.MODEL_ACTIVATIONS, "ms-marco-TinyBERT-L-2-v2", "identity")
+    monkeypatch.setitem(settings.MODEL_CALIBRATION, "ms-marco-TinyBERT-L-2-v2", (2.0, 1.0))
+    pipeline = ReRankPipeline.from_model_id("ms-marco-TinyBERT-L-2-v2")
+    assert np.allclose(pipeline.score_pairs(pairs), 2 * logits + 1)
+    # Identity scores are logits, thresholds outside [0, 1] apply as is.
+    lowest = float((2 * logits + 1).min())
+    assert len(pipeline.invoke(query=QUERY, contexts=CONTEXTS, threshold=lowest)) == len(CONTEXTS)
+    assert [context for _, context in pipeline.invoke_with_score(query=QUERY, contexts=CONTEXTS)] == \
+        PIPELINE.invoke(query=QUERY, contexts=CONTEXTS)
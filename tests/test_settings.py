@@ -0,0 +1,122 @@
+import io
+import os
+import hashlib
+import zipfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from swiftrank import settings
+
+MODEL_ID = "ms-marco-TinyBERT-L-2-v2"
+
+
+def build_archive() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in settings.MODEL_FILES:
+            archive.writestr(f"{MODEL_ID}/{name}", "{}")
+        archive.writestr(f"{MODEL_ID}/{settings.MODEL_MAP[MODEL_ID]}", os.urandom(64 * 1024))
+    return buffer.getvalue()
+
+
+class ModelServer(ThreadingHTTPServer):
+    """Serve one archive with range requests and a linked sha256 etag, like Hugging Face."""
+    def __init__(self, archive: bytes, sha256: str = None, fail_ranges: set = ()) -> None:
+        super().__init__(('127.0.0.1', 0), ModelHandler)
+        self.archive, self.sha256 = archive, sha256 or hashlib.sha256(archive).hexdigest()
+        self.fail_ranges, self.ranges = set(fail_ranges), []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(self.server.archive)))
+        self.send_header("X-Linked-Etag", f'"{self.server.sha256}"')
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        start, end = map(int, self.headers["Range"].removeprefix("bytes=").split("-"))
+        self.server.ranges.append(start)
+        if start in self.server.fail_ranges:
+            self.server.fail_ranges.discard(start)
+            self.send_error(500)
+            return
+        body = self.server.archive[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.server.archive)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(settings, "DOWNLOAD_CHUNK_SIZE", 8 * 1024)
+    return tmp_path
+
+def test_get_model_path_downloads_ranges_in_parallel(cache_dir, monkeypatch):
+    server = ModelServer(build_archive())
+    monkeypatch.setattr(settings, "MODEL_URL", server.url)
+
+    model_dir = settings.get_model_path(MODEL_ID)
+    assert (model_dir / settings.READY_MARKER).exists()
+    assert (model_dir / settings.MODEL_MAP[MODEL_ID]).stat().st_size == 64 * 1024
+    assert sorted(path.name for path in cache_dir.iterdir()) == [f"{MODEL_ID}", f"{MODEL_ID}.lock"]
+    assert len(server.ranges) > 1
+    server.shutdown()
+
+def test_get_model_path_resumes_interrupted_download(cache_dir, monkeypatch):
+    server = ModelServer(build_archive(), fail_ranges={16 * 1024})
+    monkeypatch.setattr(settings, "MODEL_URL", server.url)
+    monkeypatch.setattr(settings, "DOWNLOAD_CONNECTIONS", 1)
+    chunks = -(-len(server.archive) // settings.DOWNLOAD_CHUNK_SIZE)
+
+    with pytest.raises(requests.HTTPError):
+        settings.get_model_path(MODEL_ID)
+    assert not (cache_dir / MODEL_ID).exists()
+
+    fetched = set(server.ranges) - {16 * 1024}
+    server.ranges.clear()
+    model_dir = settings.get_model_path(MODEL_ID)
+    assert (model_dir / settings.READY_MARKER).exists()
+    assert fetched.isdisjoint(server.ranges)
+    assert fetched | set(server.ranges) == {idx * settings.DOWNLOAD_CHUNK_SIZE for idx in range(chunks)}
+    server.shutdown()
+
+def test_get_model_path_rejects_checksum_mismatch(cache_dir, monkeypatch):
+    server = ModelServer(build_archive(), sha256="0" * 64)
+    monkeypatch.setattr(settings, "MODEL_URL", server.url)
+
+    with pytest.raises(OSError, match="Checksum mismatch"):
+        settings.get_model_path(MODEL_ID)
+    assert not (cache_dir / MODEL_ID).exists()
+    assert not (cache_dir / f"{MODEL_ID}.zip").exists()
+    server.shutdown()
+
+def test_get_model_path_downloads_over_incomplete_legacy_directory(cache_dir, monkeypatch):
+    server = ModelServer(build_archive())
+    monkeypatch.setattr(settings, "MODEL_URL", server.url)
+    legacy_dir = cache_dir / MODEL_ID
+    legacy_dir.mkdir()
+    for name in settings.MODEL_FILES:
+        (legacy_dir / name).write_text("{}")
+    (legacy_dir / settings.MODEL_MAP[MODEL_ID]).write_bytes(b"\x08\x07\x12")
+
+    model_dir = settings.get_model_path(MODEL_ID)
+    assert server.ranges
+    assert (model_dir / settings.READY_MARKER).exists()
+    assert (model_dir / settings.MODEL_MAP[MODEL_ID]).stat().st_size == 64 * 1024
+    server.shutdown()
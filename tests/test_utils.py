@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from swiftrank.interface.utils import compile_schema, object_parser, sniff_format, load_input
+
+files_path = Path(__file__).parent.parent / 'files'
+CONTEXTS = json.loads((files_path / 'contexts.json').read_text())
+
+def test_compiled_schema_is_cached():
+    assert compile_schema('.categories[].items') is compile_schema('.categories[].items')
+
+def test_compiled_schema_paths():
+    items = compile_schema('.categories[].items')(CONTEXTS)
+    assert items == CONTEXTS['categories'][0]['items']
+    assert compile_schema('.categories[0].items[1].name')(CONTEXTS) == items[1]['name']
+    assert compile_schema('.')(CONTEXTS) is CONTEXTS
+    assert object_parser(items[0], '.payload.status') == items[0]['payload']['status']
+
+def test_compiled_schema_errors():
+    with pytest.raises(ValueError, match="'name' is not a valid schema."):
+        compile_schema('name')
+    with pytest.raises(ValueError, match="'.missing' schema not compatible with input data."):
+        object_parser(CONTEXTS, '.missing')
+
+def test_sniff_input_format():
+    assert sniff_format((files_path / 'contexts.json').read_text()) == 'json'
+    assert sniff_format((files_path / 'contexts.jsonl').read_text()) == 'jsonl'
+    assert sniff_format((files_path / 'contexts.yaml').read_text()) == 'yaml'
+    assert sniff_format((files_path / 'contextlines.yaml').read_text()) == 'yaml'
+    assert sniff_format('[{"a": 1}]') == 'json'
+    assert sniff_format('{\n  "a": 1\n}') == 'json'
+
+def test_load_input():
+    assert load_input((files_path / 'contexts.json').read_text()) == (CONTEXTS, False)
+    assert load_input((files_path / 'contexts.yaml').read_text(), 'yaml')[0]['categories'][0]['items'][0]['name'] \
+        == 'Monogatari Series: Second Season'
+
+    lines, documents = load_input((files_path / 'contexts.jsonl').read_text())
+    assert documents and len(lines) == 10
+    yaml_lines, documents = load_input((files_path / 'contextlines.yaml').read_text())
+    assert documents and [item['name'] for item in yaml_lines] == [item['name'] for item in lines]
+    assert load_input('# comment\n---\na: 1\n') == ({'a': 1}, False)
+
+    with pytest.raises(ValueError):
+        load_input((files_path / 'contexts.jsonl').read_text(), 'json')
+    with pytest.raises(ValueError):
+        load_input('a: [1', 'yaml')